@@ -0,0 +1,58 @@
+#compares the memory and speed of CompactResponders against the plain responder dict
+#usage: PYTHONPATH=. python benchmarks/bench_compact_state.py [--sizes 1000 100000 1000000]
+import argparse
+import json
+import logging
+import random
+import time
+import tracemalloc
+
+from disaster_app import CompactResponders, assign_responder, update_responder
+
+def build(kind, size):
+    responders = {f"R{i}": ("available" if i % 2 else "busy") for i in range(size)}
+    return responders if kind == "dict" else CompactResponders(responders)
+
+#ops per second of calling fn on each item
+def rate(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    elapsed = time.perf_counter() - start
+    return round(len(items) / elapsed) if elapsed else None
+
+def measure(kind, size, ops):
+    tracemalloc.start()
+    responders = build(kind, size)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    names = [f"R{random.randrange(size)}" for _ in range(ops)]
+    report = {"location": "NYC", "severity": 1}
+    return {
+        "kind": kind,
+        "responders": size,
+        "memory_bytes": memory,
+        "bytes_per_responder": round(memory / size, 1),
+        "update_ops_per_sec": rate(lambda name: update_responder(name, "available", responders), names),
+        "lookup_ops_per_sec": rate(lambda name: responders[name], names),
+        #assigning from a plain dict scans every responder, so keep these runs short
+        "assign_ops_per_sec": rate(lambda _: assign_responder(report, responders), range(min(ops, 100))),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact vs dict responder state benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--ops", type=int, default=10000, help="Updates/lookups timed per run")
+    parser.add_argument("--output", type=str, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO) #per-call logging would swamp the timings
+    results = [measure(kind, size, args.ops) for size in args.sizes for kind in ("dict", "compact")]
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#throughput/latency benchmark for the dispatch hot path
+#drives parse_emergency_report, assign_responder, update_responder and send_alert across pool
+#sizes and thread counts and reports ops/sec with p50/p99 latency as JSON for make_report.py
+#usage: PYTHONPATH=. python benchmarks/bench_dispatch.py --output benchmark.json
+import argparse
+import json
+import logging
+import platform
+import random
+import threading
+import time
+from datetime import datetime
+
+from disaster_app import (CompactResponders, ResponderPool, assign_responder, parse_emergency_report,
+                          send_alert, update_responder)
+
+OPERATIONS = ("parse_emergency_report", "assign_responder", "update_responder", "send_alert")
+
+def build(state, size):
+    responders = {f"R{i}": "available" for i in range(size)}
+    if state == "pool":
+        return ResponderPool(responders)
+    if state == "compact":
+        return CompactResponders(responders)
+    return responders
+
+#returns a function doing one timed call of the operation, plus an untimed follow up (or None)
+def workload(operation, responders, size):
+    report = {"location": "NYC", "severity": "3"}
+    if operation == "parse_emergency_report":
+        return lambda: parse_emergency_report(report), None
+    if operation == "send_alert":
+        return lambda: send_alert("Fire reported", "NYC"), None
+    if operation == "update_responder":
+        names = [f"R{i}" for i in range(size)]
+        return lambda: update_responder(random.choice(names), "available", responders), None
+    #release every responder straight after so small pools never run dry (the release isn't in
+    #the latency samples but does count towards the wall clock behind ops/sec)
+    def release(result):
+        update_responder(result[0], "available", responders)
+    return lambda: assign_responder(report, responders), release
+
+#the value at percentile pct of already sorted samples
+def percentile(samples, pct):
+    if not samples:
+        return 0
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+def run(operation, state, size, threads, ops):
+    responders = build(state, size)
+    call, follow_up = workload(operation, responders, size)
+    latencies = [[] for _ in range(threads)]
+    start_line = threading.Barrier(threads + 1)
+
+    def worker(samples):
+        start_line.wait()
+        for _ in range(ops):
+            began = time.perf_counter_ns()
+            result = call()
+            samples.append(time.perf_counter_ns() - began)
+            if follow_up:
+                follow_up(result)
+
+    workers = [threading.Thread(target=worker, args=(samples,)) for samples in latencies]
+    for t in workers:
+        t.start()
+    start_line.wait()
+    began = time.perf_counter()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - began
+
+    samples = sorted(sample for thread_samples in latencies for sample in thread_samples)
+    return {
+        "operation": operation,
+        "state": state,
+        "responders": size,
+        "threads": threads,
+        "ops": len(samples),
+        "ops_per_sec": round(len(samples) / elapsed) if elapsed else None,
+        "p50_us": round(percentile(samples, 50) / 1000, 2),
+        "p99_us": round(percentile(samples, 99) / 1000, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Dispatch hot path benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000, 1000000])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--ops", type=int, default=2000, help="Calls per thread per run")
+    parser.add_argument("--state", type=str, default="pool", choices=["pool", "dict", "compact"],
+                        help="Responder state to dispatch from (plain dicts scan every responder)")
+    parser.add_argument("--operations", type=str, nargs="+", default=list(OPERATIONS), choices=OPERATIONS)
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO) #measure the dispatch work, not the log handler
+    results = []
+    for size in args.sizes:
+        for threads in args.threads:
+            for operation in args.operations:
+                result = run(operation, args.state, size, threads, args.ops)
+                print(f"{operation:24} {size:>8} responders {threads:>2} threads | "
+                      f"{result['ops_per_sec']:>9} ops/s | p50 {result['p50_us']}us | p99 {result['p99_us']}us")
+                results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": datetime.utcnow().isoformat(),
+                "python": platform.python_version(),
+                "results": results,
+            }, f, indent=2)
+        print(f"[INFO] Benchmark results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
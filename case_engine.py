@@ -0,0 +1,150 @@
+"""In-process interpreter for the JSON test cases in tests/cases.
+
+Unit cases call one disaster_app function with `input` and compare the result with
+`expected` (or check that `expected_error` is raised). Integration cases run the full
+parse -> assign -> alert -> release flow over `responders` and `report` and check the
+statuses and alert text in `expected`.
+"""
+import logging
+import time
+import traceback
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager, nullcontext
+
+import disaster_app
+
+# functions a unit case may name in its "function" field (parse_emergency_report by default)
+UNIT_FUNCTIONS = {
+    "parse_emergency_report": lambda case: disaster_app.parse_emergency_report(case["input"]),
+    "send_alert": lambda case: disaster_app.send_alert(case["input"]["message"], case["input"]["location"]),
+    "update_responder": lambda case: dict(disaster_app.update_responder(
+        case["input"]["responder"], case["input"]["status"], dict(case["input"]["responders"]))),
+}
+
+
+class CaseFailure(AssertionError):
+    """Raised when a case runs but its expectations don't hold."""
+
+
+def check(condition, message):
+    if not condition:
+        raise CaseFailure(message)
+
+
+def run_unit_case(case):
+    function = case.get("function", "parse_emergency_report")
+    if function not in UNIT_FUNCTIONS:
+        raise ValueError(f"Unknown function {function}")
+
+    expected_error = case.get("expected_error")
+    try:
+        result = UNIT_FUNCTIONS[function](case)
+    except Exception as e:
+        if expected_error and type(e).__name__ == expected_error:
+            return
+        raise
+    check(not expected_error, f"Expected {expected_error}, got {result!r}")
+    check(result == case["expected"], f"Expected {case['expected']!r}, got {result!r}")
+
+
+def run_integration_case(case):
+    expected = case.get("expected", {})
+    responders = dict(case["responders"])
+
+    report = disaster_app.parse_emergency_report(case["report"])
+    responder, responders = disaster_app.assign_responder(report, responders)
+    if "assigned_status" in expected:
+        check(responders[responder] == expected["assigned_status"],
+              f"Expected {responder} to be {expected['assigned_status']}, got {responders[responder]}")
+
+    alert = disaster_app.send_alert(case.get("message", "Emergency reported"), report["location"])
+    if "alert_contains" in expected:
+        check(expected["alert_contains"] in alert, f"Alert {alert!r} doesn't contain {expected['alert_contains']!r}")
+
+    responders = disaster_app.update_responder(responder, "available", responders)
+    if "final_status" in expected:
+        check(responders[responder] == expected["final_status"],
+              f"Expected {responder} to end {expected['final_status']}, got {responders[responder]}")
+
+
+def run_case(case):
+    """Run one case and return its result: id, type, description, status, message, details, time."""
+    result = {
+        "id": case.get("id"),
+        "type": case.get("type"),
+        "description": case.get("description", ""),
+        "status": "passed",
+        "message": "",
+        "details": ""
+    }
+    started = time.perf_counter()
+    try:
+        if "responders" in case and "report" in case:
+            run_integration_case(case)
+        elif "input" in case:
+            run_unit_case(case)
+        else:
+            raise ValueError("Case has neither input nor responders/report")
+    except CaseFailure as e:
+        result.update(status="failed", message=str(e), details=traceback.format_exc())
+    except Exception as e:
+        result.update(status="error", message=f"{type(e).__name__}: {e}", details=traceback.format_exc())
+    result["time"] = time.perf_counter() - started
+    return result
+
+
+@contextmanager
+def quiet():
+    """Silence disaster_app's per-call INFO logging while running lots of cases."""
+    logging.disable(logging.INFO)
+    try:
+        yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def run_cases(cases, log=False, on_result=None, fail_fast=False):
+    """Run cases in this interpreter and return their results in order.
+
+    on_result is called with each result as soon as it's ready; with fail_fast the run
+    stops after the first failed or erroring case.
+    """
+    results = []
+    with (nullcontext() if log else quiet()):
+        for case in cases:
+            result = run_case(case)
+            results.append(result)
+            if on_result:
+                on_result(result)
+            if fail_fast and result["status"] in ("failed", "error"):
+                break
+    return results
+
+
+def to_junit(results):
+    """Build a JUnit <testsuite> element for case results."""
+    suite = ET.Element("testsuite", name="cases")
+    counts = {"tests": len(results), "failures": 0, "errors": 0, "skipped": 0}
+    for result in results:
+        testcase = ET.SubElement(suite, "testcase", classname=f"cases.{result['type']}",
+                                 name=str(result["id"]), time=f"{result['time']:.6f}")
+        if result["status"] == "failed":
+            counts["failures"] += 1
+            ET.SubElement(testcase, "failure", message=result["message"]).text = result["details"]
+        elif result["status"] == "error":
+            counts["errors"] += 1
+            ET.SubElement(testcase, "error", message=result["message"]).text = result["details"]
+        elif result["status"] == "skipped":
+            counts["skipped"] += 1
+            ET.SubElement(testcase, "skipped", message=result["message"])
+    for key, value in counts.items():
+        suite.set(key, str(value))
+    suite.set("time", f"{sum(result['time'] for result in results):.3f}")
+    return suite
+
+
+def write_junit(results, junit_file):
+    """Write case results as JUnit XML that make_report.parse_junit can read."""
+    root = ET.Element("testsuites", name="cases")
+    root.append(to_junit(results))
+    ET.ElementTree(root).write(junit_file, encoding="utf-8", xml_declaration=True)
@@ -1,13 +1,829 @@
 #the functions of the disaster response system 
 #
+import asyncio
+import atexit
+import heapq
+import itertools
+import json
+import math
+import mmap
+import multiprocessing
+import os
 import random
 import logging
+import queue
+import sys
 import threading
+import time
+from array import array
+from collections import deque
+from collections.abc import ItemsView, MutableMapping, ValuesView
+from datetime import datetime
 
-responder_lock = threading.Lock()
+#plain responder dicts are locked by striping on the dict's identity so calls on
+#independent dicts (separate regions, separate test fixtures) don't block each other
+LOCK_STRIPES = 64
+_dict_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+#conditions on the same stripes, signalled by update_responder when someone becomes available
+_dict_conds = [threading.Condition(lock) for lock in _dict_locks]
+#id(dict) -> deque of tickets for the threads waiting on that dict, oldest first
+#(guarded by the dict's stripe lock, an entry only exists while someone is waiting)
+_dict_waiters = {}
 
 logging.basicConfig(level=logging.INFO)
 
+#returns the lock that guards a plain responders dict (always the same one for the same dict)
+def _dict_lock(responders):
+    return _dict_locks[(id(responders) >> 4) % LOCK_STRIPES]
+
+#returns the condition that waiters on a plain responders dict sleep on
+def _dict_cond(responders):
+    return _dict_conds[(id(responders) >> 4) % LOCK_STRIPES]
+
+#histogram with power of two buckets, cheap enough to update on every call
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * 65 #bucket i counts values below 2**i (and at least 2**(i - 1))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        value = max(0, int(value))
+        self.buckets[min(value.bit_length(), 64)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    #upper bound of the bucket holding the pct-th percentile
+    def percentile(self, pct):
+        if not self.count:
+            return None
+        target = self.count * pct / 100
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return min(2 ** i, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min,
+            "max": self.max,
+            "mean": round(self.total / self.count, 1) if self.count else None,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "buckets": {str(2 ** i): n for i, n in enumerate(self.buckets) if n},
+        }
+
+#what instrumentation collects for one operation (assign_responder, update_responder, ...)
+class _OperationStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.failures = {} #exception name -> count
+        self.latency_ns = Histogram() #whole call
+        self.lock_wait_ns = Histogram() #per lock acquisition
+        self.lock_hold_ns = Histogram() #per lock acquisition
+        self.pool_size = Histogram() #responders in the pool when called
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "failures": dict(self.failures),
+                "latency_ns": self.latency_ns.snapshot(),
+                "lock_wait_ns": self.lock_wait_ns.snapshot(),
+                "lock_hold_ns": self.lock_hold_ns.snapshot(),
+                "pool_size": self.pool_size.snapshot(),
+            }
+
+#opt-in instrumentation of the dispatch hot path, see enable_instrumentation
+class Instrumentation:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def operation(self, name):
+        stats = self._operations.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._operations.setdefault(name, _OperationStats())
+        return stats
+
+    #run fn(*args) as one call of the named operation
+    def call(self, name, pool_size, fn, *args):
+        stats = self.operation(name)
+        began = time.perf_counter_ns()
+        failure = None
+        try:
+            return fn(*args)
+        except (RuntimeError, ValueError) as e:
+            failure = type(e).__name__
+            raise
+        finally:
+            elapsed = time.perf_counter_ns() - began
+            with stats.lock:
+                stats.calls += 1
+                stats.latency_ns.add(elapsed)
+                stats.pool_size.add(pool_size)
+                if failure:
+                    stats.failures[failure] = stats.failures.get(failure, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            operations = dict(self._operations)
+        return {name: stats.snapshot() for name, stats in sorted(operations.items())}
+
+#times how long it takes to get a lock and how long it is held
+#condition waits go through wait() so the time the lock is released while waiting isn't counted as held
+class _TimedLock:
+    __slots__ = ("lock", "stats", "acquired", "waited")
+
+    def __init__(self, lock, stats):
+        self.lock = lock
+        self.stats = stats
+
+    def __enter__(self):
+        began = time.perf_counter_ns()
+        self.lock.acquire()
+        self.acquired = time.perf_counter_ns()
+        self.waited = 0
+        wait = self.acquired - began
+        with self.stats.lock:
+            self.stats.lock_wait_ns.add(wait)
+        return self.lock
+
+    def __exit__(self, *exc):
+        self.lock.release()
+        hold = time.perf_counter_ns() - self.acquired - self.waited
+        with self.stats.lock:
+            self.stats.lock_hold_ns.add(hold)
+
+    #Condition.wait on the wrapped condition, leaving the wait (and getting the lock back) out of hold time
+    def wait(self, timeout=None):
+        began = time.perf_counter_ns()
+        try:
+            return self.lock.wait(timeout)
+        finally:
+            self.waited += time.perf_counter_ns() - began
+
+#None while instrumentation is off, so the hot path only pays for one global lookup
+_instrumentation = None
+
+#install (or with None, remove) the Instrumentation the hot path records into, returns the previous one
+def set_instrumentation(instrumentation):
+    global _instrumentation
+    previous, _instrumentation = _instrumentation, instrumentation
+    return previous
+
+#turn instrumentation on (starting from empty histograms) and return it
+def enable_instrumentation():
+    instrumentation = Instrumentation()
+    set_instrumentation(instrumentation)
+    return instrumentation
+
+def disable_instrumentation():
+    set_instrumentation(None)
+
+#{operation: {calls, failures, latency_ns, lock_wait_ns, lock_hold_ns, pool_size}}, empty when off
+def instrumentation_snapshot(instrumentation=None):
+    instrumentation = instrumentation or _instrumentation
+    return instrumentation.snapshot() if instrumentation else {}
+
+#write a snapshot (of the active instrumentation by default) as JSON for make_report.py --instrumentation
+def dump_instrumentation(path, instrumentation=None):
+    with open(path, "w") as f:
+        json.dump({"timestamp": datetime.utcnow().isoformat(), "operations": instrumentation_snapshot(instrumentation)}, f, indent=2)
+
+#the lock itself when instrumentation is off, a timing wrapper for the operation when it's on
+def _timed_lock(lock, operation):
+    instrumentation = _instrumentation
+    if instrumentation is None:
+        return lock
+    return _TimedLock(lock, instrumentation.operation(operation))
+
+#DISASTER_APP_INSTRUMENT=path turns instrumentation on for the whole process and dumps it on exit
+if os.environ.get("DISASTER_APP_INSTRUMENT"):
+    atexit.register(dump_instrumentation, os.environ["DISASTER_APP_INSTRUMENT"], enable_instrumentation())
+
+#someone waiting on a ResponderPool for a responder to free up
+#thread waiters sleep on an event, asyncio waiters on a future resolved from the releasing thread
+class _Waiter:
+    __slots__ = ("responder", "cancelled", "event", "loop", "future", "point")
+
+    def __init__(self, loop=None, point=None):
+        self.responder = None
+        self.point = point
+        self.cancelled = False
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+
+    def wake(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.future.set_result, self.responder)
+        else:
+            self.event.set()
+
+#uniform grid over planar (x, y) coordinates for finding the nearest responder
+#adding and removing a point is O(1), nearest searches outwards ring by ring from the query cell
+class SpatialGrid:
+    def __init__(self, cell_size=1.0):
+        self.cell_size = cell_size
+        self._cells = {} #(cx, cy) -> {name: point}
+        self._cell_of = {} #name -> (cx, cy)
+        self._bounds = None #(min cx, min cy, max cx, max cy) of every cell used so far
+
+    def __len__(self):
+        return len(self._cell_of)
+
+    def __contains__(self, name):
+        return name in self._cell_of
+
+    def _cell(self, point):
+        return (math.floor(point[0] / self.cell_size), math.floor(point[1] / self.cell_size))
+
+    def add(self, name, point):
+        self.remove(name)
+        cell = self._cell(point)
+        self._cells.setdefault(cell, {})[name] = point
+        self._cell_of[name] = cell
+        if self._bounds is None:
+            self._bounds = cell + cell
+        else:
+            minx, miny, maxx, maxy = self._bounds
+            self._bounds = (min(minx, cell[0]), min(miny, cell[1]), max(maxx, cell[0]), max(maxy, cell[1]))
+
+    def remove(self, name):
+        cell = self._cell_of.pop(name, None)
+        if cell is None:
+            return
+        points = self._cells[cell]
+        del points[name]
+        if not points:
+            del self._cells[cell]
+
+    #name of the closest point to point (None if the grid is empty)
+    def nearest(self, point):
+        if not self._cell_of:
+            return None
+        cx, cy = self._cell(point)
+        minx, miny, maxx, maxy = self._bounds
+        last_ring = max(cx - minx, maxx - cx, cy - miny, maxy - cy)
+        best, best_distance = None, math.inf
+
+        for ring in range(last_ring + 1):
+            #nothing in this ring or further out can beat what we already have
+            if best is not None and best_distance <= (ring - 1) * self.cell_size:
+                break
+            #once a ring has more cells than are occupied it is cheaper to check them all
+            if 8 * ring > len(self._cells):
+                return self._closest(point, self._cells.values(), best, best_distance)[0]
+            best, best_distance = self._closest(point, self._ring(cx, cy, ring), best, best_distance)
+        return best
+
+    def _ring(self, cx, cy, ring):
+        if ring == 0:
+            return [self._cells.get((cx, cy))]
+        cells = []
+        for dx in range(-ring, ring + 1):
+            cells.append(self._cells.get((cx + dx, cy - ring)))
+            cells.append(self._cells.get((cx + dx, cy + ring)))
+        for dy in range(-ring + 1, ring):
+            cells.append(self._cells.get((cx - ring, cy + dy)))
+            cells.append(self._cells.get((cx + ring, cy + dy)))
+        return cells
+
+    def _closest(self, point, cells, best, best_distance):
+        for points in cells:
+            if not points:
+                continue
+            for name, other in points.items():
+                distance = math.hypot(other[0] - point[0], other[1] - point[1])
+                if distance < best_distance:
+                    best, best_distance = name, distance
+        return best, best_distance
+
+#a dict-like collection of responders that keeps an index of the available ones
+#so assigning, releasing and updating a responder are all O(1) instead of a full scan
+#each pool has its own lock for the available index, plus striped locks so status
+#updates to different responders that don't touch the index never wait on each other
+#when nobody is free, waiters are handed the next released responder in wait_order:
+#"fifo" (first come first served) or "severity" (most severe report first)
+#responders given (x, y) locations are also kept in a SpatialGrid of the available ones so the
+#"nearest" strategy can pick the closest free unit, places maps named report locations to (x, y)
+#with a ResponderJournal every status change is journaled so the pool can be recovered after a restart
+class ResponderPool(MutableMapping):
+    def __init__(self, responders=None, stripes=16, wait_order="fifo", locations=None, places=None, cell_size=1.0,
+                 journal=None):
+        if wait_order not in ("fifo", "severity"):
+            raise ValueError(f"Unknown wait order {wait_order}")
+        self._status = {} #name -> status, same shape as the plain dict
+        self._available = [] #names of available responders (swap-remove array)
+        self._position = {} #name -> index into self._available
+        self._lock = threading.Lock() #guards self._available / self._position
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._wait_order = wait_order
+        self._waiters = [] #heap of (priority, sequence, _Waiter)
+        self._sequence = itertools.count()
+        self._coordinates = {} #name -> (x, y)
+        self._grid = SpatialGrid(cell_size) #available responders that have coordinates
+        self.places = dict(places or {})
+        for name, point in dict(locations or {}).items():
+            self._coordinates[name] = tuple(point)
+        self._journal = None
+        if responders:
+            for name, status in dict(responders).items():
+                self[name] = status
+        if journal is not None:
+            journal.attach(self)
+            self._journal = journal
+
+    #add a responder to the available index
+    def _index(self, name):
+        if name not in self._position:
+            self._position[name] = len(self._available)
+            self._available.append(name)
+            if name in self._coordinates:
+                self._grid.add(name, self._coordinates[name])
+
+    #take a responder out of the available index by swapping the last one into its slot
+    def _unindex(self, name):
+        pos = self._position.pop(name, None)
+        if pos is None:
+            return
+        self._grid.remove(name)
+        last = self._available.pop()
+        if last != name:
+            self._available[pos] = last
+            self._position[last] = pos
+
+    def __getitem__(self, name):
+        return self._status[name]
+
+    #pool[name] = status takes the same locks as set_status and hands a freed responder to a waiter
+    def __setitem__(self, name, status):
+        with _timed_lock(self._stripe(name), "update_responder"), _timed_lock(self._lock, "update_responder"):
+            self._set_locked(name, status)
+            if status == "available":
+                self._serve_waiters_locked()
+
+    def __delitem__(self, name):
+        with _timed_lock(self._stripe(name), "update_responder"), _timed_lock(self._lock, "update_responder"):
+            entry = self._journal.entry(name, None) if self._journal is not None and name in self._status else None
+            del self._status[name]
+            self._unindex(name)
+            self._coordinates.pop(name, None)
+            if entry is not None:
+                self._journal.append(entry)
+
+    #same as pool[name] = status without the locking or waiter handoff, the caller holds the pool lock
+    def _set_locked(self, name, status):
+        entry = self._journal.entry(name, status) if self._journal is not None else None
+        self._status[name] = status
+        if status == "available":
+            self._index(name)
+        else:
+            self._unindex(name)
+        if entry is not None:
+            self._journal.append(entry)
+
+    def __iter__(self):
+        return iter(self._status)
+
+    def __len__(self):
+        return len(self._status)
+
+    def __repr__(self):
+        return f"ResponderPool({self._status!r})"
+
+    #number of responders that can be assigned right now
+    def available_count(self):
+        return len(self._available)
+
+    #move a responder to (x, y), keeping the spatial index in sync if they're available
+    def set_location(self, name, point):
+        with self._lock:
+            if name not in self._status:
+                raise ValueError(f"Responder {name} not found")
+            self._coordinates[name] = tuple(point)
+            if name in self._position:
+                self._grid.add(name, self._coordinates[name])
+
+    #(x, y) of a report: its coordinates, a location that is already a pair, or a known place
+    def locate(self, report):
+        if report.get("coordinates") is not None:
+            return tuple(report["coordinates"])
+        location = report.get("location")
+        if isinstance(location, (list, tuple)) and len(location) == 2:
+            return tuple(location)
+        return self.places.get(location)
+
+    #the striped lock that serializes updates to one responder
+    def _stripe(self, name):
+        return self._stripes[hash(name) % len(self._stripes)]
+
+    #pick a random available responder (or the nearest one to point) and mark them busy
+    #timeout=0 returns None straight away if nobody is free, otherwise waits up to timeout
+    #seconds (None waits forever) to be handed the next released responder
+    def acquire(self, timeout=0, severity=0, point=None):
+        with _timed_lock(self._lock, "assign_responder"):
+            chosen = self._acquire_locked(point)
+            if chosen is not None or timeout == 0:
+                return chosen
+            waiter = self._enqueue_locked(_Waiter(point=point), severity)
+        waiter.event.wait(timeout)
+        return self._finish_wait(waiter)
+
+    #asyncio version of acquire, waits without blocking the event loop
+    async def acquire_async(self, timeout=0, severity=0, point=None):
+        with _timed_lock(self._lock, "assign_responder"):
+            chosen = self._acquire_locked(point)
+            if chosen is not None or timeout == 0:
+                return chosen
+            waiter = self._enqueue_locked(_Waiter(asyncio.get_running_loop(), point), severity)
+        try:
+            #shield the future so a timeout never drops a responder that was just handed over
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            chosen = self._finish_wait(waiter)
+            if chosen is not None:
+                self.release(chosen)
+            raise
+        return self._finish_wait(waiter)
+
+    def _enqueue_locked(self, waiter, severity):
+        priority = -severity if self._wait_order == "severity" else 0
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        return waiter
+
+    #after waking up (or timing out) take the handed over responder, or give up our place
+    def _finish_wait(self, waiter):
+        with self._lock:
+            if waiter.responder is None:
+                waiter.cancelled = True
+            return waiter.responder
+
+    #hand freshly available responders to whoever has been waiting longest / is most severe
+    def _serve_waiters_locked(self):
+        while self._waiters and self._available:
+            waiter = heapq.heappop(self._waiters)[2]
+            if waiter.cancelled:
+                continue
+            waiter.responder = self._acquire_locked(waiter.point)
+            waiter.wake()
+
+    #same as acquire, for callers that already hold the pool lock
+    def _acquire_locked(self, point=None):
+        if not self._available:
+            return None
+        chosen = self._grid.nearest(point) if point is not None else None
+        if chosen is None:
+            #no point given or nobody free has coordinates
+            chosen = random.choice(self._available)
+        self._set_locked(chosen, "busy")
+        return chosen
+
+    #change one responder's status, only taking the pool lock when the available index changes
+    def set_status(self, name, status):
+        with _timed_lock(self._stripe(name), "update_responder"):
+            if name not in self._status:
+                raise ValueError(f"Responder {name} not found")
+            if self._status[name] != "available" and status != "available":
+                #busy -> some other non-available status, nothing else can touch this responder
+                entry = self._journal.entry(name, status) if self._journal is not None else None
+                self._status[name] = status
+                if entry is not None:
+                    self._journal.append(entry)
+                return
+            with _timed_lock(self._lock, "update_responder"):
+                self._set_locked(name, status)
+                if status == "available":
+                    self._serve_waiters_locked()
+
+    #mark a responder as available again
+    def release(self, name):
+        self.set_status(name, "available")
+
+#memory-light stand in for the plain {name: status} dict, meant for very large fleets
+#every name is stored once in a single sorted byte string (looked up by binary search) and each
+#status is a one byte code into a small table of status strings, so a million responders take a
+#few megabytes instead of a dict entry plus two string objects each
+#adding or removing names rebuilds the table (O(N)), it's built for fleets that don't change shape
+class CompactResponders(MutableMapping):
+    def __init__(self, responders=None):
+        self._statuses = ["available", "busy"] #code -> status
+        self._codes = {"available": 0, "busy": 1} #status -> code
+        self._build(dict(responders or {}).items())
+
+    def _build(self, items):
+        encoded = sorted((name.encode(), self._code(status)) for name, status in items)
+        self._names = b"".join(name for name, _ in encoded)
+        self._offsets = array("Q", [0]) #name i is self._names[offsets[i]:offsets[i + 1]]
+        end = 0
+        for name, _ in encoded:
+            end += len(name)
+            self._offsets.append(end)
+        self._state = bytearray(code for _, code in encoded)
+
+    def _code(self, status):
+        code = self._codes.get(status)
+        if code is None:
+            if len(self._statuses) == 256:
+                raise ValueError("Too many distinct responder statuses")
+            code = self._codes[status] = len(self._statuses)
+            self._statuses.append(status)
+        return code
+
+    def _name(self, i):
+        return self._names[self._offsets[i]:self._offsets[i + 1]].decode()
+
+    #position of a name in the table, or -1
+    def _find(self, name):
+        if not isinstance(name, str):
+            return -1
+        key = name.encode()
+        names, offsets = self._names, self._offsets
+        lo, hi = 0, len(self._state)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if names[offsets[mid]:offsets[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._state) and names[offsets[lo]:offsets[lo + 1]] == key:
+            return lo
+        return -1
+
+    def __getitem__(self, name):
+        i = self._find(name)
+        if i < 0:
+            raise KeyError(name)
+        return self._statuses[self._state[i]]
+
+    def __setitem__(self, name, status):
+        i = self._find(name)
+        if i < 0:
+            self._build(list(self.items()) + [(name, status)])
+        else:
+            self._state[i] = self._code(status)
+
+    def __delitem__(self, name):
+        if self._find(name) < 0:
+            raise KeyError(name)
+        self._build([(other, status) for other, status in self.items() if other != name])
+
+    def __contains__(self, name):
+        return self._find(name) >= 0
+
+    def __iter__(self):
+        for i in range(len(self._state)):
+            yield self._name(i)
+
+    def __len__(self):
+        return len(self._state)
+
+    def __repr__(self):
+        return f"CompactResponders({dict(self.items())!r})"
+
+    def items(self):
+        return _CompactItems(self)
+
+    def values(self):
+        return _CompactValues(self)
+
+    #bytes used by the name table and status codes
+    def nbytes(self):
+        return len(self._names) + self._offsets.itemsize * len(self._offsets) + len(self._state)
+
+    #mark a random available responder busy and return their name (None if nobody is free)
+    #random probes are uniform, when free responders are too sparse for probing to hit one it
+    #falls back to the next free one after a random starting point
+    def _pick_available(self):
+        state = self._state
+        if not state:
+            return None
+        for _ in range(32):
+            i = random.randrange(len(state))
+            if state[i] == 0:
+                break
+        else:
+            i = state.find(0, random.randrange(len(state)))
+            if i < 0:
+                i = state.find(0)
+            if i < 0:
+                return None
+        state[i] = 1
+        return self._name(i)
+
+#items/values views that walk the table in order instead of looking every name up again
+class _CompactItems(ItemsView):
+    def __iter__(self):
+        responders = self._mapping
+        for i, code in enumerate(responders._state):
+            yield responders._name(i), responders._statuses[code]
+
+class _CompactValues(ValuesView):
+    def __iter__(self):
+        responders = self._mapping
+        for code in responders._state:
+            yield responders._statuses[code]
+
+#append-only journal of responder status changes so state survives a restart
+#changes are buffered and written in batches as "name<TAB>status" lines to numbered segment files
+#every snapshot_every changes the state is snapshotted (statuses grouped, names listed once) and the
+#journal rolls to a new segment, older segments are deleted once the snapshot is safely on disk
+#recover() loads the latest snapshot and replays the newer segments through a memory map
+class ResponderJournal:
+    def __init__(self, directory, batch_size=1000, snapshot_every=100000):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._since_snapshot = 0
+        self._source = None #the responders being journaled, see attach
+        self._snapshot_writer = None
+        os.makedirs(directory, exist_ok=True)
+        segments = self._segments()
+        self._segment = segments[-1] if segments else 0
+        self._file = open(self._segment_path(self._segment), "ab")
+        self._drop_partial_line()
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"journal-{segment:08d}.log")
+
+    def _snapshot_path(self):
+        return os.path.join(self.directory, "snapshot.json")
+
+    def _segments(self):
+        return sorted(int(f[8:16]) for f in os.listdir(self.directory) if f.startswith("journal-") and f.endswith(".log"))
+
+    #a crash mid-write can leave half a line at the end, cut it off before appending more
+    def _drop_partial_line(self):
+        size = self._file.seek(0, os.SEEK_END)
+        if not size:
+            return
+        with open(self._segment_path(self._segment), "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                end = mm.rfind(b"\n") + 1
+        if end != size:
+            self._file.truncate(end)
+            self._file.seek(end)
+
+    #start journaling changes to responders (a dict or mapping), beginning with a snapshot of it
+    def attach(self, responders):
+        self._source = responders
+        self.snapshot(wait=True)
+
+    #the journal line for a change, checked before the change is applied so a bad name can't leave
+    #the responders changed but not journaled
+    def entry(self, name, status):
+        for text in (name, status or ""):
+            if "\t" in text or "\n" in text:
+                raise ValueError("Responder names and statuses can't contain tabs or newlines")
+        return name if status is None else f"{name}\t{status}"
+
+    #queue a line from entry() once its change has been applied, snapshotting when one is due
+    def append(self, line):
+        with self._lock:
+            self._buffer.append(line)
+            self._since_snapshot += 1
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+            due = self._source is not None and self._since_snapshot >= self.snapshot_every
+        if due:
+            self.snapshot()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._buffer:
+            self._file.write(("\n".join(self._buffer) + "\n").encode())
+            self._buffer = []
+        self._file.flush()
+
+    #roll to a new segment and snapshot the attached responders, in the background unless wait=True
+    #only the roll happens on the caller's thread (which may hold the pool lock), the writer copies the
+    #responders afterwards, so changes made in between can be in both the snapshot and the new segment
+    #replaying them twice is harmless since every line sets a responder's whole status
+    def snapshot(self, wait=False):
+        with self._lock:
+            if self._snapshot_writer is not None and self._snapshot_writer.is_alive():
+                if not wait:
+                    return #one is already being written
+                self._snapshot_writer.join()
+            self._flush_locked()
+            self._since_snapshot = 0
+            self._file.close()
+            self._segment += 1
+            self._file = open(self._segment_path(self._segment), "ab")
+            self._snapshot_writer = threading.Thread(target=self._write_snapshot, args=(self._segment,), daemon=True)
+            self._snapshot_writer.start()
+        if wait:
+            self._snapshot_writer.join()
+
+    #the attached responders' (name, status) pairs, copied again if someone is added or removed mid-copy
+    def _copy_source(self):
+        while True:
+            try:
+                return list(self._source.items())
+            except (RuntimeError, KeyError, IndexError):
+                continue
+
+    def _write_snapshot(self, segment):
+        grouped = {}
+        for name, status in self._copy_source():
+            grouped.setdefault(status, []).append(name)
+        temp = self._snapshot_path() + ".tmp"
+        with open(temp, "w") as f:
+            json.dump({"segment": segment, "responders": grouped}, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self._snapshot_path())
+        for older in self._segments():
+            if older < segment:
+                os.remove(self._segment_path(older))
+
+    #rebuild {name: status} from the latest snapshot plus every change journaled after it
+    def recover(self):
+        self.flush()
+        responders = {}
+        first = 0
+        if os.path.exists(self._snapshot_path()):
+            with open(self._snapshot_path(), "r") as f:
+                snapshot = json.load(f)
+            first = snapshot["segment"]
+            for status, names in snapshot["responders"].items():
+                responders.update(dict.fromkeys(names, status))
+
+        for segment in self._segments():
+            if segment >= first:
+                _replay_segment(self._segment_path(segment), responders)
+        return responders
+
+    def close(self):
+        if self._snapshot_writer is not None:
+            self._snapshot_writer.join()
+        self.flush()
+        self._file.close()
+
+#replays a segment onto responders a chunk of whole lines at a time, straight out of the memory map
+def _replay_segment(path, responders, chunk_size=1 << 24):
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            while start < len(mm):
+                end = mm.rfind(b"\n", start, start + chunk_size) + 1
+                if end <= start:
+                    end = mm.find(b"\n", start) + 1 #one line longer than a chunk
+                    if not end:
+                        break #half written line from a crash
+                lines = mm[start:end - 1].decode()
+                start = end
+                if lines.count("\t") == lines.count("\n") + 1:
+                    #only status changes, let dict.update apply them in order (last one wins)
+                    parts = iter(lines.replace("\t", "\n").split("\n"))
+                    responders.update(zip(parts, parts))
+                    continue
+                for line in lines.split("\n"):
+                    name, tab, status = line.partition("\t")
+                    if tab:
+                        responders[name] = status
+                    else:
+                        responders.pop(name, None)
+
+#plain responders dict that journals every change it sees (assign_responder and update_responder
+#treat it exactly like a normal dict)
+class JournaledResponders(dict):
+    def __init__(self, journal, responders=None):
+        super().__init__(responders or {})
+        self._journal = journal
+        journal.attach(self)
+
+    def __setitem__(self, name, status):
+        entry = self._journal.entry(name, status)
+        super().__setitem__(name, status)
+        self._journal.append(entry)
+
+    def __delitem__(self, name):
+        entry = self._journal.entry(name, None) if name in self else None
+        super().__delitem__(name)
+        if entry is not None:
+            self._journal.append(entry)
+
 #processes a incoming emergency report
 def parse_emergency_report(report):
     if "location" not in report or "severity" not in report:
@@ -15,39 +831,515 @@ def parse_emergency_report(report):
         raise ValueError("Invalid report format") 
     
     #returns a report ensuring severity is an int
-    return {"location": report["location"], "severity": int(report["severity"])}
+    parsed = {"location": report["location"], "severity": int(report["severity"])}
+    if report.get("coordinates") is not None:
+        #optional (x, y) used by the "nearest" assignment strategy
+        x, y = report["coordinates"]
+        parsed["coordinates"] = (float(x), float(y))
+    if report.get("region") is not None:
+        #optional region used by the RegionalDispatcher to route the report
+        parsed["region"] = report["region"]
+    return parsed
+
 
+#lazily reads a feed of newline-delimited JSON reports from a path, an open file or "-" (stdin)
+#and yields them parsed the same way as parse_emergency_report, reading chunk_size bytes at a
+#time so memory stays flat however big the feed is
+#bad records don't stop the feed, they go to rejects as {"line", "record", "error"}: rejects
+#can be a callable or a file-like object (which gets one JSON line per reject)
+def stream_reports(source, rejects=None, chunk_size=1 << 16):
+    if source == "-":
+        yield from _stream_lines(sys.stdin, rejects, chunk_size)
+    elif isinstance(source, str):
+        with open(source, "r") as f:
+            yield from _stream_lines(f, rejects, chunk_size)
+    else:
+        yield from _stream_lines(source, rejects, chunk_size)
+
+def _stream_lines(f, rejects, chunk_size):
+    line_number = 0
+    while True:
+        lines = f.readlines(chunk_size)
+        if not lines:
+            return
+        for line in lines:
+            line_number += 1
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                report = json.loads(line)
+                if not isinstance(report, dict):
+                    raise ValueError("Invalid report format")
+                yield parse_emergency_report(report)
+            except (ValueError, TypeError) as e:
+                _reject(rejects, {"line": line_number, "record": line, "error": str(e)})
+
+def _reject(rejects, rejected):
+    logging.warning(f"Rejected report on line {rejected['line']}: {rejected['error']}")
+    if rejects is None:
+        return
+    if hasattr(rejects, "write"):
+        rejects.write(json.dumps(rejected) + "\n")
+    else:
+        rejects(rejected)
+
+#ways assign_responder can pick a responder: any free one at random, or the closest free one
+STRATEGIES = ("random", "nearest")
 
 #assigns a responder (if available) to an emergency
-def assign_responder(report, responders):  
-    with responder_lock: #only one thread can come in at a time (to avoid race conditions)
-        #find all the available responders
-        available = [name for name, status in responders.items() if status == "available"]
+#responders can be a plain dict or a ResponderPool (which avoids scanning every responder)
+#by default it fails straight away when nobody is free, a timeout (in seconds, None for
+#forever) waits for update_responder to free someone up instead of making callers poll
+#strategy="nearest" needs a ResponderPool with responder locations and a locatable report
+def assign_responder(report, responders, timeout=0, strategy="random"):  
+    instrumentation = _instrumentation
+    if instrumentation is not None:
+        return instrumentation.call("assign_responder", len(responders), _assign_responder, report, responders, timeout, strategy)
+    return _assign_responder(report, responders, timeout, strategy)
+
+def _assign_responder(report, responders, timeout, strategy):
+    if isinstance(responders, ResponderPool):
+        #the pool does its own locking and serves waiters in its wait_order
+        point = _strategy_point(report, responders, strategy)
+        chosen = responders.acquire(timeout, int(report.get("severity", 0)), point)
+    else:
+        _strategy_point(report, responders, strategy)
+        chosen = _assign_from_dict(responders, timeout)
+
+    #if none are available send an error
+    if chosen is None:
+        raise RuntimeError("No responders available")
+
+    logging.info(f"Responder {chosen} assigned to {report['location']}")
+    return chosen, responders
+
+#asyncio version of assign_responder
+#pools wait natively on the event loop, plain dicts wait on a worker thread
+async def assign_responder_async(report, responders, timeout=0, strategy="random"):
+    if not isinstance(responders, ResponderPool):
+        return await asyncio.to_thread(assign_responder, report, responders, timeout, strategy)
+
+    point = _strategy_point(report, responders, strategy)
+    chosen = await responders.acquire_async(timeout, int(report.get("severity", 0)), point)
+    if chosen is None:
+        raise RuntimeError("No responders available")
+
+    logging.info(f"Responder {chosen} assigned to {report['location']}")
+    return chosen, responders
 
-        #if none are available send an error
-        if not available:
-            raise RuntimeError("No responders available")
+#the (x, y) to search from for the given strategy (None for random picks)
+def _strategy_point(report, responders, strategy):
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown assignment strategy {strategy}")
+    if strategy == "random":
+        return None
+    if not isinstance(responders, ResponderPool):
+        raise ValueError("The nearest strategy needs a ResponderPool")
+    point = responders.locate(report)
+    if point is None:
+        raise ValueError(f"Cannot resolve location {report.get('location')}")
+    return point
 
-        #pick one at random
-        chosen = random.choice(available)
-        responders[chosen] = "busy" #mark the responder as busy
-        logging.info(f"Responder {chosen} assigned to {report['location']}")
-        return chosen, responders
+#picks a random available responder out of a plain dict, waiting up to timeout if needed
+#waiters are served first come first served (plain dicts have no wait_order, that needs a ResponderPool)
+def _assign_from_dict(responders, timeout):
+    deadline = None if timeout is None else time.monotonic() + timeout
+    #the condition itself, or a timing wrapper whose wait() keeps waiting out of the hold time
+    signal = _dict_cond(responders)
+    cond = _timed_lock(signal, "assign_responder")
+    with cond: #only one thread per dict can come in at a time (to avoid race conditions)
+        #newcomers don't jump ahead of anyone already waiting on this dict
+        if id(responders) not in _dict_waiters:
+            chosen = _take_from_dict(responders)
+            if chosen is not None or timeout == 0:
+                return chosen
+        waiting = _dict_waiters.setdefault(id(responders), deque())
+        ticket = object()
+        waiting.append(ticket)
+        try:
+            while True:
+                if waiting[0] is ticket:
+                    chosen = _take_from_dict(responders)
+                    if chosen is not None:
+                        return chosen
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                cond.wait(remaining)
+        finally:
+            waiting.remove(ticket)
+            if not waiting:
+                del _dict_waiters[id(responders)]
+            #the next waiter in line may be able to go now
+            signal.notify_all()
+
+#takes a free responder out of a plain dict (None if nobody is free), the caller holds its lock
+def _take_from_dict(responders):
+    if isinstance(responders, CompactResponders):
+        #finds a free responder straight from the status codes, no list of names needed
+        return responders._pick_available()
+    #find all the available responders
+    available = [name for name, status in responders.items() if status == "available"]
+    if not available:
+        return None
+    #pick one at random and mark them as busy
+    chosen = random.choice(available)
+    responders[chosen] = "busy"
+    return chosen
+
+#assigns responders to a burst of reports while taking the lock only once
+#the most severe reports are served first, results come back in the same order as the reports
+#each result is the assigned responder's name, or "queued" if nobody was free
+def assign_responders_batch(reports, responders, strategy="random"):
+    instrumentation = _instrumentation
+    if instrumentation is not None:
+        return instrumentation.call("assign_responders_batch", len(responders), _assign_responders_batch, reports, responders, strategy)
+    return _assign_responders_batch(reports, responders, strategy)
+
+def _assign_responders_batch(reports, responders, strategy):
+    #validate everything up front so a bad report doesn't leave the batch half assigned
+    parsed = [parse_emergency_report(report) for report in reports]
+    points = [_strategy_point(report, responders, strategy) for report in parsed]
+    heap = [(-report["severity"], i) for i, report in enumerate(parsed)]
+    heapq.heapify(heap)
+    results = ["queued"] * len(parsed)
+
+    if isinstance(responders, ResponderPool):
+        with _timed_lock(responders._lock, "assign_responders_batch"):
+            while heap:
+                i = heap[0][1]
+                chosen = responders._acquire_locked(points[i])
+                if chosen is None:
+                    break
+                heapq.heappop(heap)
+                results[i] = chosen
+    else:
+        with _timed_lock(_dict_lock(responders), "assign_responders_batch"):
+            available = [name for name, status in responders.items() if status == "available"]
+            while heap and available:
+                #swap-remove a random pick so each assignment is O(1)
+                pick = random.randrange(len(available))
+                available[pick], available[-1] = available[-1], available[pick]
+                chosen = available.pop()
+                responders[chosen] = "busy"
+                results[heapq.heappop(heap)[1]] = chosen
+
+    for report, result in zip(parsed, results):
+        if result == "queued":
+            logging.info(f"No responder free for {report['location']}, report queued")
+        else:
+            logging.info(f"Responder {result} assigned to {report['location']}")
+    return results
 
 #updates the status of a responder
 def update_responder(responder, status, responders):
-    with responder_lock:
-        #send an error if the responder isnt in the dicttionary
-        if responder not in responders:
-            raise ValueError(f"Responder {responder} not found")
-        
-        #update and return
-        responders[responder] = status
-        logging.info(f"Responder update: {responder} is now {status}")
-        return responders
+    instrumentation = _instrumentation
+    if instrumentation is not None:
+        return instrumentation.call("update_responder", len(responders), _update_responder, responder, status, responders)
+    return _update_responder(responder, status, responders)
+
+def _update_responder(responder, status, responders):
+    if isinstance(responders, ResponderPool):
+        #raises ValueError itself and keeps the available index in sync
+        responders.set_status(responder, status)
+    else:
+        cond = _dict_cond(responders)
+        with _timed_lock(cond, "update_responder"):
+            #send an error if the responder isnt in the dicttionary
+            if responder not in responders:
+                raise ValueError(f"Responder {responder} not found")
+            responders[responder] = status
+            if status == "available":
+                cond.notify_all() #wake anyone waiting in assign_responder
+
+    logging.info(f"Responder update: {responder} is now {status}")
+    return responders
+
+#delivers alerts off the caller's thread: send_alert drops messages into a bounded queue
+#and a background worker flushes them in batches to the log, a file and any subscribers
+#when the queue is full publish reports backpressure by returning False (or waits, if block=True)
+class AlertSink:
+    def __init__(self, maxsize=10000, batch_size=100, log=True, file=None, block=False):
+        self.batch_size = batch_size
+        self.log = log
+        self.file = file
+        self.block = block
+        self.subscribers = [] #callbacks that get each flushed batch (a list of messages)
+        self.delivered = 0
+        self.dropped = 0
+        self.failed = 0 #messages the file could not be written for (not counted as delivered)
+        self._queue = queue.Queue(maxsize)
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="alert-sink", daemon=True)
+        self._worker.start()
+
+    #register a callback to receive every flushed batch of alerts
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    #queue an alert, returns False if it was dropped because the queue is full
+    def publish(self, message):
+        if self._closed:
+            raise RuntimeError("Alert sink is closed")
+        try:
+            self._queue.put(message, block=self.block)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    #wait until every alert queued so far has been delivered
+    def flush(self):
+        self._queue.join()
+
+    #deliver whatever is left and stop the worker
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        #a full queue only has room again once the worker takes a batch, don't wait on a dead one
+        while self._worker.is_alive():
+            try:
+                self._queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        self._worker.join()
+
+    def stats(self):
+        return {"queued": self._queue.qsize(), "delivered": self.delivered, "dropped": self.dropped, "failed": self.failed}
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            messages = [message for message in batch if message is not None]
+            try:
+                if messages:
+                    self._deliver(messages)
+            except Exception:
+                logging.exception("Alert delivery failed")
+            finally:
+                #flush() must never be left waiting on a batch, whatever happened to it
+                for _ in batch:
+                    self._queue.task_done()
+            if len(messages) < len(batch):
+                return #close() was called
+
+    def _deliver(self, messages):
+        if self.log:
+            try:
+                for message in messages:
+                    logging.info(message)
+            except Exception:
+                logging.exception("Alert logging failed")
+        if self.file:
+            try:
+                with open(self.file, "a") as f:
+                    f.write("\n".join(messages) + "\n")
+            except OSError:
+                self.failed += len(messages)
+                logging.exception(f"Could not write alerts to {self.file}")
+                written = False
+            else:
+                written = True
+        for callback in self.subscribers:
+            try:
+                callback(messages)
+            except Exception:
+                logging.exception("Alert subscriber failed")
+        if not self.file or written:
+            self.delivered += len(messages)
+
+#when set, send_alert hands messages to this sink instead of logging them itself
+_alert_sink = None
+
+#install (or with None, remove) the sink send_alert publishes to, returns the previous one
+def set_alert_sink(sink):
+    global _alert_sink
+    previous, _alert_sink = _alert_sink, sink
+    return previous
 
 #sends an alert message out
 def send_alert(message, location):
     alertMessage = f"ALERT: {message} at {location}"
-    logging.info(alertMessage)
-    return alertMessage
\ No newline at end of file
+    if _alert_sink is None:
+        logging.info(alertMessage)
+    elif not _alert_sink.publish(alertMessage):
+        #the sink is backed up, say so instead of losing the alert without a trace
+        logging.warning(f"Alert queue full, dropped: {alertMessage}")
+    return alertMessage
+
+#spreads dispatch over several processes: responders are split up by region, each region is
+#owned by one worker process, and reports are routed to the worker owning their region
+#(report["region"], falling back to report["location"]) so validation, assignment and alert
+#formatting for different regions run on different cores
+#valid reports for a region with nobody free (or a region nobody owns) are handed to other regions
+#that still have free responders, most severe reports first
+class RegionalDispatcher:
+    def __init__(self, responders_by_region, processes=None):
+        regions = sorted(responders_by_region)
+        processes = max(1, min(processes or multiprocessing.cpu_count(), len(regions) or 1))
+        self._owner = {region: i % processes for i, region in enumerate(regions)}
+        self._available = {region: 0 for region in regions} #free responders per region
+        self._connections = []
+        self._workers = []
+        for worker_id in range(processes):
+            owned = {region: dict(responders_by_region[region]) for region in regions if self._owner[region] == worker_id}
+            parent, child = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_dispatch_worker, args=(child, owned), daemon=True)
+            worker.start()
+            child.close()
+            self._connections.append(parent)
+            self._workers.append(worker)
+        for reply in self._broadcast(("status",)):
+            self._available.update(reply)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    #dispatch a burst of raw reports, returning one result per report in the same order:
+    #{"status": "assigned", "region", "responder", "alert"}, {"status": "queued"}
+    #or {"status": "rejected", "error"} for reports that fail parse_emergency_report
+    def dispatch(self, reports):
+        results = [None] * len(reports)
+        leftovers = []
+        routed = [[] for _ in self._connections]
+        for i, report in enumerate(reports):
+            region = report.get("region", report.get("location"))
+            if region in self._owner:
+                routed[self._owner[region]].append((i, report, region))
+                continue
+            #nobody owns it, so check it here before it takes a fallback slot from a valid report
+            try:
+                parse_emergency_report(report)
+            except (ValueError, TypeError) as e:
+                results[i] = {"status": "rejected", "error": str(e)}
+                continue
+            leftovers.append((i, report))
+        for i, result in self._assign(routed):
+            if result["status"] == "queued":
+                leftovers.append((i, reports[i]))
+            else:
+                results[i] = result
+
+        #cross-region fallback: share the leftovers out to regions that still have capacity
+        leftovers.sort(key=lambda item: -_severity(item[1]))
+        routed = [[] for _ in self._connections]
+        for region, free in sorted(self._available.items(), key=lambda item: -item[1]):
+            take, leftovers = leftovers[:free], leftovers[free:]
+            routed[self._owner[region]].extend((i, report, region) for i, report in take)
+        for i, result in self._assign(routed):
+            results[i] = result
+        for i, _ in leftovers:
+            results[i] = {"status": "queued"}
+        return results
+
+    #change a responder's status in the region that owns them
+    def update(self, region, responder, status):
+        if region not in self._owner:
+            raise ValueError(f"Region {region} not found")
+        connection = self._connections[self._owner[region]]
+        connection.send(("update", region, responder, status))
+        reply = connection.recv()
+        if isinstance(reply, Exception):
+            raise reply
+        self._available.update(reply)
+
+    #{region: {name: status}} for every region, fetched from the workers
+    def snapshot(self):
+        state = {}
+        for reply in self._broadcast(("snapshot",)):
+            state.update(reply)
+        return state
+
+    def close(self):
+        for connection in self._connections:
+            try:
+                connection.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.join()
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+        self._workers = []
+
+    #send routed work to every worker at once, then collect what comes back
+    def _assign(self, routed):
+        busy = []
+        for connection, work in zip(self._connections, routed):
+            if work:
+                connection.send(("assign", work))
+                busy.append(connection)
+        for connection in busy:
+            results, available = connection.recv()
+            self._available.update(available)
+            yield from results
+
+    def _broadcast(self, command):
+        for connection in self._connections:
+            connection.send(command)
+        return [connection.recv() for connection in self._connections]
+
+def _severity(report):
+    try:
+        return int(report.get("severity", 0))
+    except (TypeError, ValueError):
+        return 0
+
+#runs in each RegionalDispatcher worker process, serving commands for the regions it owns
+def _dispatch_worker(connection, owned):
+    logging.disable(logging.INFO) #the parent gets the results back, don't log every assignment per process
+    pools = {region: ResponderPool(responders) for region, responders in owned.items()}
+
+    def available():
+        return {region: pool.available_count() for region, pool in pools.items()}
+
+    while True:
+        command = connection.recv()
+        if command[0] == "stop":
+            return
+        elif command[0] == "status":
+            connection.send(available())
+        elif command[0] == "snapshot":
+            connection.send({region: dict(pool) for region, pool in pools.items()})
+        elif command[0] == "update":
+            _, region, responder, status = command
+            try:
+                update_responder(responder, status, pools[region])
+                connection.send(available())
+            except ValueError as e:
+                connection.send(e)
+        elif command[0] == "assign":
+            connection.send((_dispatch_work(command[1], pools), available()))
+
+def _dispatch_work(work, pools):
+    results = []
+    by_region = {}
+    for i, report, region in work:
+        try:
+            by_region.setdefault(region, []).append((i, parse_emergency_report(report)))
+        except (ValueError, TypeError) as e:
+            results.append((i, {"status": "rejected", "error": str(e)}))
+
+    for region, parsed in by_region.items():
+        assigned = assign_responders_batch([report for _, report in parsed], pools[region])
+        for (i, report), responder in zip(parsed, assigned):
+            if responder == "queued":
+                results.append((i, {"status": "queued"}))
+            else:
+                alert = send_alert(f"Responder {responder} dispatched", report["location"])
+                results.append((i, {"status": "assigned", "region": region, "responder": responder, "alert": alert}))
+    return results
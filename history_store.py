@@ -0,0 +1,192 @@
+"""Append-only store for the run history make_report keeps in reports/history/.
+
+Runs are written one JSON object per line to numbered NDJSON segments
+(runs-000000.ndjson, ...) holding `segment_size` runs each, so adding a run appends a
+line instead of rewriting the file, and the git diff is just that line. A small
+index.json keeps the run count, the segment list, the last run, the most recent
+value of keys that not every run has (benchmarks), per-test failure counts and
+derived state such as the rolling trends and per-test duration baselines, so "last
+run" lookups never read the segments and tail(n) only reads the last n lines.
+
+Stored runs are compact: failures keep their test, class and a shortened message
+but not the traceback, and coverage keeps the overall rates but not the per-file
+details (both stay in final_report.json for the current run). Per-test durations
+aren't stored per run either; make_report keeps their rolling baselines in the index.
+"""
+import json
+import os
+
+HISTORY_DIR = os.path.join("reports", "history")
+# keys whose latest value is kept in the index even when the last run lacks them
+LATEST_KEYS = ("benchmarks",)
+MAX_MESSAGE = 200
+
+
+def compact_run(run):
+    """The part of a final report worth keeping for every run."""
+    stored = {
+        "timestamp": run.get("timestamp"),
+        "summary": run.get("summary", {}),
+        "failures": [
+            {
+                "test": failure.get("test"),
+                "classname": failure.get("classname"),
+                "error": (failure.get("error") or "")[:MAX_MESSAGE]
+            }
+            for failure in run.get("failures", [])
+        ],
+        "coverage": {key: value for key, value in run.get("coverage", {}).items() if key != "details"},
+        "delta": run.get("delta", {})
+    }
+    if run.get("duration") is not None:
+        stored["duration"] = run["duration"]
+    if run.get("benchmarks"):
+        stored["benchmarks"] = run["benchmarks"]
+    return stored
+
+
+class HistoryStore:
+    """NDJSON segments plus an index; append and last-run lookups don't depend on the history length.
+
+    legacy_file="" opens the store without migrating an old history.json (for readers like the runner).
+    """
+
+    def __init__(self, directory=HISTORY_DIR, segment_size=1000, legacy_file=None):
+        self.directory = directory
+        if legacy_file is None:
+            # reports/history -> reports/history.json
+            legacy_file = os.path.normpath(directory) + ".json"
+        self.index_file = os.path.join(directory, "index.json")
+        self.index = {"version": 1, "segment_size": segment_size, "runs": 0, "segments": [], "last": None,
+                      "latest": {}}
+        if os.path.exists(self.index_file):
+            with open(self.index_file, "r") as f:
+                self.index = json.load(f)
+        elif legacy_file and os.path.exists(legacy_file):
+            self.migrate(legacy_file)
+
+    def __len__(self):
+        return self.index["runs"]
+
+    def last(self):
+        """The most recent run, or None."""
+        return self.index["last"]
+
+    def latest(self, key):
+        """The most recent run's value for key (e.g. benchmarks), skipping runs without it."""
+        return self.index["latest"].get(key)
+
+    def state(self, key):
+        """Derived state kept alongside the index (e.g. rolling trends), or None."""
+        return self.index.get("state", {}).get(key)
+
+    def set_state(self, key, value):
+        """Replace derived state; saved with the next append() or save()."""
+        self.index.setdefault("state", {})[key] = value
+
+    def test_failures(self):
+        """{classname::test: {"count": runs it failed in, "last": timestamp of the latest}} from the index."""
+        return self.state("test_failures") or {}
+
+    def _count_failures(self):
+        failures = {}
+        for run in self:
+            for failure in run.get("failures", []):
+                key = f"{failure.get('classname')}::{failure.get('test')}"
+                entry = failures.setdefault(key, {"count": 0, "last": ""})
+                entry["count"] += 1
+                entry["last"] = run.get("timestamp") or ""
+        return failures
+
+    def append(self, run, save=True):
+        """Append a run (compacted) and return what was stored."""
+        stored = compact_run(run)
+        if self.state("test_failures") is None:
+            # index from before per-test failure counts were kept: count the stored runs once
+            self.set_state("test_failures", self._count_failures())
+        failures = self.state("test_failures")
+        for failure in stored["failures"]:
+            entry = failures.setdefault(f"{failure['classname']}::{failure['test']}", {"count": 0, "last": ""})
+            entry["count"] += 1
+            entry["last"] = stored["timestamp"] or ""
+        segments = self.index["segments"]
+        if not segments or segments[-1]["runs"] >= self.index["segment_size"]:
+            segments.append({"file": f"runs-{len(segments):06d}.ndjson", "runs": 0, "bytes": 0})
+        segment = segments[-1]
+        line = (json.dumps(stored, separators=(",", ":")) + "\n").encode()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, segment["file"])
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            # write after the last run the index knows about, dropping anything a crashed run left behind
+            f.seek(segment["bytes"])
+            f.write(line)
+            f.truncate()
+
+        segment["runs"] += 1
+        segment["bytes"] += len(line)
+        self.index["runs"] += 1
+        self.index["last"] = stored
+        for key in LATEST_KEYS:
+            if stored.get(key):
+                self.index["latest"][key] = stored[key]
+        if save:
+            self.save()
+        return stored
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temp = self.index_file + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(temp, self.index_file)
+
+    def _read_segment(self, segment):
+        path = os.path.join(self.directory, segment["file"])
+        if not os.path.exists(path):
+            return []
+        with open(path, "rb") as f:
+            # a run is only committed once the index counts it
+            data = f.read(segment["bytes"])
+        return [json.loads(line) for line in data.splitlines()]
+
+    def _tail_segment(self, segment, n, block=1 << 16):
+        """The last n runs of a segment, reading it backwards from the end until it has them."""
+        path = os.path.join(self.directory, segment["file"])
+        if not n or not os.path.exists(path):
+            return []
+        with open(path, "rb") as f:
+            start = segment["bytes"]
+            data = b""
+            # every run ends in a newline, so n runs are complete once n + 1 newlines are in (or the start is)
+            while start > 0 and data.count(b"\n") <= n:
+                step = min(block, start)
+                start -= step
+                f.seek(start)
+                data = f.read(step) + data
+        lines = data.split(b"\n")[:-1]
+        if start > 0:
+            lines = lines[1:]  # cut mid-run
+        return [json.loads(line) for line in lines[-n:]]
+
+    def __iter__(self):
+        """Every run, oldest first, one segment in memory at a time."""
+        for segment in self.index["segments"]:
+            yield from self._read_segment(segment)
+
+    def tail(self, n):
+        """The last n runs, oldest first, reading only the ends of the segments they're in."""
+        runs = []
+        for segment in reversed(self.index["segments"]):
+            if len(runs) >= n:
+                break
+            runs = self._tail_segment(segment, n - len(runs)) + runs
+        return runs
+
+    def migrate(self, legacy_file):
+        """One-time import of the old reports/history.json list; the old file is removed afterwards."""
+        with open(legacy_file, "r") as f:
+            history = json.load(f)
+        for run in history:
+            self.append(run, save=False)
+        self.save()
+        os.remove(legacy_file)
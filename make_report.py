@@ -1,10 +1,17 @@
+import argparse
 import sys
 import xml.etree.ElementTree as ET
+from xml.parsers import expat
 import json
 import os
 import logging
+import statistics
+import time
 from datetime import datetime
 
+from history_store import HistoryStore
+from trends import TrendEngine, run_metrics
+
 
 os.makedirs("reports", exist_ok=True)
 
@@ -15,28 +22,72 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s"
 )
 
+# defaults for the per-test duration checks (make_report's duration_limits / --max-* flags)
+DURATION_LIMITS = {
+    "baseline_runs": 10,   # baseline is the median of a test's times over this many previous runs
+    "top": 10,             # how many slowest tests / slowdowns to list
+    "min_slowdown": 0.1,   # seconds; smaller slowdowns are noise
+    "max_suite": 300,      # the README's <5 minute target
+    "max_test": None,
+    "max_slowdown": None,  # ratio over baseline, e.g. 2.0
+}
+# tests not timed in this many runs (renamed or deleted) are dropped from the duration baselines
+DURATION_KEEP_RUNS = 100
+
+
 def parse_junit(junit_file):
-    """Parse JUnit XML (pytest results) and return summary + failure details."""
-    try:
-        tree = ET.parse(junit_file)
-        root = tree.getroot()
-        suite = root.find("testsuite") if root.tag == "testsuites" else root
-
-        total = int(suite.attrib.get("tests", 0))
-        failures = int(suite.attrib.get("failures", 0))
-        errors = int(suite.attrib.get("errors", 0))
-        skipped = int(suite.attrib.get("skipped", 0))
-        passed = total - failures - errors - skipped
+    """Parse JUnit XML (pytest results) and return summary + failure details.
 
+    Streams the file with iterparse, dropping each testcase once it's been read so
+    memory doesn't grow with the number of tests, and adds up every <testsuite>
+    (sharded runs write several).
+    """
+    try:
+        counts = {"tests": 0, "failures": 0, "errors": 0, "skipped": 0}
+        duration = 0.0
+        test_durations = {}
         failure_details = []
-        for testcase in suite.iter("testcase"):
-            for failure in testcase.iter("failure"):
-                failure_details.append({
-                    "test": testcase.attrib.get("name"),
-                    "classname": testcase.attrib.get("classname"),
-                    "error": failure.attrib.get("message", "").strip(),
-                    "details": failure.text.strip() if failure.text else ""
-                })
+        # open elements, so finished testcases can be detached from their suite
+        stack = []
+        # suites that contain other suites only total their children
+        containers = set()
+
+        for event, elem in ET.iterparse(junit_file, events=("start", "end")):
+            if event == "start":
+                if elem.tag == "testsuite" and stack and stack[-1].tag == "testsuite":
+                    containers.add(id(stack[-1]))
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            if elem.tag == "testcase":
+                key = f"{elem.attrib.get('classname')}::{elem.attrib.get('name')}"
+                test_durations[key] = test_durations.get(key, 0.0) + float(elem.attrib.get("time", 0))
+                for failure in elem.iter("failure"):
+                    failure_details.append({
+                        "test": elem.attrib.get("name"),
+                        "classname": elem.attrib.get("classname"),
+                        "error": failure.attrib.get("message", "").strip(),
+                        "details": failure.text.strip() if failure.text else ""
+                    })
+                elem.clear()
+                if stack:
+                    stack[-1].remove(elem)
+            elif elem.tag == "testsuite":
+                if id(elem) not in containers:
+                    for key in counts:
+                        counts[key] += int(elem.attrib.get(key, 0))
+                    duration += float(elem.attrib.get("time", 0))
+                containers.discard(id(elem))
+                elem.clear()
+                if stack:
+                    stack[-1].remove(elem)
+
+        total = counts["tests"]
+        failures = counts["failures"]
+        errors = counts["errors"]
+        skipped = counts["skipped"]
+        passed = total - failures - errors - skipped
 
         return {
             "summary": {
@@ -46,45 +97,190 @@ def parse_junit(junit_file):
                 "errors": errors,
                 "skipped": skipped
             },
-            "failures": failure_details
+            "failures": failure_details,
+            "duration": round(duration, 3),
+            "test_durations": test_durations
         }
     except Exception as e:
         logging.error(f"Failed to parse JUnit file {junit_file}: {e}")
         return {"summary": {}, "failures": []}
 
 
-def parse_coverage(cov_file):
-    """Parse coverage XML and return overall + per-function stats."""
+def iter_events(events_file, follow=False, poll=0.2):
+    """Yield events from a runner --events JSON-lines stream as they are written.
+
+    With follow=True keep reading until the run's session_finished event arrives
+    (like tail -f), so a report can be built while the tests are still running.
+    Parallel runs write one session per worker, each session_started saying how
+    many workers there are; following stops once that many sessions have finished.
+    """
+    with open(events_file) as f:
+        buffered = ""
+        started = finished = 0
+        expected = 1
+        while True:
+            line = f.readline()
+            if not line:
+                if not follow:
+                    break
+                time.sleep(poll)
+                continue
+            buffered += line
+            if not buffered.endswith("\n"):
+                # half-written line, wait for the rest
+                continue
+            event, buffered = json.loads(buffered), ""
+            yield event
+            if event["event"] == "session_started":
+                started += 1
+                expected = max(expected, event.get("workers") or 1)
+            elif event["event"] == "session_finished":
+                finished += 1
+                if follow and finished >= max(started, expected):
+                    break
+
+
+def parse_events(events_file, follow=False):
+    """Build the same summary + failure details as parse_junit from an event stream."""
     try:
-        tree = ET.parse(cov_file)
-        root = tree.getroot()
+        statuses = {}
+        failure_details = []
+        # a test's events carry its duration so far, so the last one is the whole test
+        durations = {}
+        for event in iter_events(events_file, follow=follow):
+            kind = event["event"]
+            if not kind.startswith("test_") or kind == "test_started":
+                continue
+            status = kind[len("test_"):]
+            durations[(event.get("classname"), event["test"])] = event.get("duration", 0)
+            # a test that failed and then errored in teardown counts as failed
+            if statuses.get(event["test"]) in (None, "passed"):
+                statuses[event["test"]] = status
+            if status == "failed":
+                failure_details.append({
+                    "test": event["test"].rsplit("::", 1)[-1],
+                    "classname": event.get("classname"),
+                    "error": event.get("message", "").strip(),
+                    "details": event.get("details", "").strip()
+                })
+
+        test_durations = {}
+        for (classname, test), seconds in durations.items():
+            key = f"{classname}::{test.rsplit('::', 1)[-1]}"
+            test_durations[key] = test_durations.get(key, 0.0) + seconds
+        counts = {status: list(statuses.values()).count(status) for status in ("passed", "failed", "error", "skipped")}
+        return {
+            "summary": {
+                "total": len(statuses),
+                "passed": counts["passed"],
+                "failed": counts["failed"],
+                "errors": counts["error"],
+                "skipped": counts["skipped"]
+            },
+            "failures": failure_details,
+            "duration": round(sum(durations.values()), 3),
+            "test_durations": test_durations
+        }
+    except Exception as e:
+        logging.error(f"Failed to parse event stream {events_file}: {e}")
+        return {"summary": {}, "failures": []}
+
+
+def parse_results(results_file):
+    """Parse test results from either JUnit XML or a JSON-lines event stream."""
+    if results_file.endswith((".jsonl", ".ndjson")):
+        return parse_events(results_file)
+    return parse_junit(results_file)
 
-        overall = float(root.attrib.get("line-rate", 0)) * 100
-        coverage_details = []
 
-        for package in root.iter("package"):
-            for cls in package.iter("class"):
-                name = cls.attrib.get("name")
-                filename = cls.attrib.get("filename")
-                line_rate = float(cls.attrib.get("line-rate", 0)) * 100
+def format_ranges(ranges):
+    """[(12, 18), (40, 40)] -> "12-18,40"."""
+    return ",".join(f"{start}-{end}" if end != start else str(start) for start, end in ranges)
 
-                statements = 0
-                missing = 0
-                for line in cls.iter("line"):
-                    statements += 1
-                    if int(line.attrib.get("hits", 0)) == 0:
-                        missing += 1
 
+def parse_coverage(cov_file):
+    """Parse coverage XML and return overall + per-function stats.
+
+    Streams the file through expat, keeping only the current class's counters, so
+    memory doesn't depend on the number of lines. Missing lines are reported as
+    ranges over consecutive statements ("12-18,40", like coverage.py's report) along
+    with branch coverage.
+    """
+    try:
+        totals = {}
+        coverage_details = []
+        state = {"cls": None, "in_method": 0}
+
+        def start(tag, attrs):
+            if tag == "line":
+                cls = state["cls"]
+                if cls is None or state["in_method"]:
+                    # <methods> repeats the class's lines
+                    return
+                number = int(attrs.get("number", 0))
+                cls["statements"] += 1
+                if number < cls["last"]:
+                    cls["unordered"] = True
+                cls["last"] = number
+                if int(attrs.get("hits", 0)) == 0:
+                    cls["missing"] += 1
+                    if cls["run"]:
+                        cls["run"][1] = number
+                    else:
+                        cls["run"] = [number, number]
+                elif cls["run"]:
+                    cls["ranges"].append(tuple(cls["run"]))
+                    cls["run"] = None
+                if attrs.get("branch") == "true":
+                    # condition-coverage="50% (1/2)"
+                    covered, _, branches = attrs.get("condition-coverage", "").rpartition("(")[2].rstrip(")").partition("/")
+                    if branches:
+                        cls["branches"] += int(branches)
+                        cls["branches_covered"] += int(covered)
+            elif tag == "class":
+                state["cls"] = {"name": attrs.get("name"), "filename": attrs.get("filename"),
+                                "line_rate": float(attrs.get("line-rate", 0)) * 100,
+                                "branch_rate": float(attrs.get("branch-rate", 0)) * 100,
+                                "statements": 0, "missing": 0, "branches": 0, "branches_covered": 0,
+                                "ranges": [], "run": None, "last": 0, "unordered": False}
+            elif tag == "method":
+                state["in_method"] += 1
+            elif tag == "coverage":
+                totals.update(attrs)
+
+        def end(tag):
+            if tag == "method":
+                state["in_method"] -= 1
+            elif tag == "class" and state["cls"] is not None:
+                cls = state["cls"]
+                if cls["run"]:
+                    cls["ranges"].append(tuple(cls["run"]))
+                if cls["unordered"]:
+                    cls["ranges"] = merge_ranges(cls["ranges"])
                 coverage_details.append({
-                    "file": filename,
-                    "function": name,
-                    "statements": statements,
-                    "missing": missing,
-                    "coverage": f"{line_rate:.0f}%"
+                    "file": cls["filename"],
+                    "function": cls["name"],
+                    "statements": cls["statements"],
+                    "missing": cls["missing"],
+                    "coverage": f"{cls['line_rate']:.0f}%",
+                    "missing_lines": format_ranges(cls["ranges"]),
+                    "branches": cls["branches"],
+                    "branches_covered": cls["branches_covered"],
+                    "branch_coverage": f"{cls['branch_rate']:.0f}%"
                 })
+                state["cls"] = None
+
+        parser = expat.ParserCreate()
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        with open(cov_file, "rb") as f:
+            parser.ParseFile(f)
 
+        overall = float(totals.get("line-rate", 0)) * 100
+        branch_rate = float(totals.get("branch-rate", 0)) * 100
         return {
             "overall_coverage": f"{overall:.0f}%",
+            "overall_branch_coverage": f"{branch_rate:.0f}%",
             "details": coverage_details
         }
     except Exception as e:
@@ -92,35 +288,155 @@ def parse_coverage(cov_file):
         return {"overall_coverage": "0%", "details": []}
 
 
-def load_history(history_file="reports/history.json"):
-    """Load previous test run history."""
-    if os.path.exists(history_file):
-        with open(history_file, "r") as f:
-            return json.load(f)
-    return []
+def merge_ranges(ranges):
+    """Sort ranges and join the ones that overlap or touch (for files whose lines arrive out of order)."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
 
 
-def save_history(history, history_file="reports/history.json"):
-    os.makedirs("reports", exist_ok=True)
-    with open(history_file, "w") as f:
-        json.dump(history, f, indent=2)
+def parse_benchmarks(bench_file):
+    """Load benchmark results written by benchmarks/bench_dispatch.py."""
+    try:
+        with open(bench_file, "r") as f:
+            data = json.load(f)
+        return {
+            "timestamp": data.get("timestamp"),
+            "python": data.get("python"),
+            "results": data.get("results", [])
+        }
+    except Exception as e:
+        logging.error(f"Failed to parse benchmark file {bench_file}: {e}")
+        return {"timestamp": None, "python": None, "results": []}
+
+
+def benchmark_key(result):
+    return (result.get("operation"), result.get("state"), result.get("responders"), result.get("threads"))
+
+
+def compare_benchmarks(benchmarks, previous):
+    """Annotate each benchmark result with its ops/sec change against the previous run."""
+    previous_rates = {benchmark_key(r): r.get("ops_per_sec") for r in previous.get("results", [])}
+    for result in benchmarks["results"]:
+        before = previous_rates.get(benchmark_key(result))
+        if before and result.get("ops_per_sec") is not None:
+            result["ops_per_sec_change"] = f"{(result['ops_per_sec'] - before) / before * 100:+.1f}%"
+        else:
+            result["ops_per_sec_change"] = "N/A"
+    return benchmarks
+
+
+def update_duration_baselines(state, test_durations, window, keep_runs=DURATION_KEEP_RUNS):
+    """Add one run's per-test durations to the rolling baseline state kept in the history index.
+
+    The state is {"runs": timed runs so far, "tests": {test: {"seen": run it was last timed in,
+    "times": its last `window` durations}}}, so it's updated without reading any stored run.
+    """
+    state = state or {"runs": 0, "tests": {}}
+    state["runs"] += 1
+    tests = state["tests"]
+    for test, seconds in test_durations.items():
+        entry = tests.setdefault(test, {"seen": 0, "times": []})
+        entry["seen"] = state["runs"]
+        entry["times"].append(round(seconds, 4))
+        del entry["times"][:-window]
+    for test in [test for test, entry in tests.items() if state["runs"] - entry["seen"] >= keep_runs]:
+        del tests[test]
+    return state
+
 
+def duration_baselines(state, window):
+    """{test: median of its last `window` durations} from the rolling baseline state."""
+    if not state:
+        return {}
+    return {test: statistics.median(entry["times"][-window:]) for test, entry in state["tests"].items()}
+
+
+def compare_durations(test_durations, baselines, baseline_runs=0, top=10, min_slowdown=0.1, max_test=None,
+                      max_slowdown=None):
+    """Per-test durations against their baselines (see duration_baselines).
+
+    Returns the slowest `top` tests, the `top` biggest slowdowns (at least min_slowdown
+    seconds over baseline), every test's duration, and a violation for each test over
+    max_test seconds or more than max_slowdown times its baseline.
+    """
+    def entry(test):
+        seconds = test_durations[test]
+        baseline = baselines.get(test)
+        result = {"test": test, "duration": round(seconds, 4), "baseline": None, "change": "N/A"}
+        if baseline is not None:
+            result["baseline"] = round(baseline, 4)
+            result["change"] = f"{(seconds - baseline) / baseline * 100:+.1f}%" if baseline else "N/A"
+        return result
+
+    slower = [test for test in test_durations
+              if test in baselines and test_durations[test] - baselines[test] >= min_slowdown]
+    violations = []
+    for test, seconds in test_durations.items():
+        if max_test is not None and seconds > max_test:
+            violations.append(f"{test} took {seconds:.2f}s (limit {max_test:g}s)")
+    if max_slowdown is not None:
+        for test in slower:
+            if test_durations[test] > baselines[test] * max_slowdown:
+                violations.append(f"{test} took {test_durations[test]:.2f}s, over {max_slowdown:g}x "
+                                  f"its {baselines[test]:.2f}s baseline")
+
+    slowest = sorted(test_durations, key=test_durations.get, reverse=True)[:top]
+    slowdowns = sorted(slower, key=lambda test: test_durations[test] - baselines[test], reverse=True)[:top]
+    return {
+        "baseline_runs": baseline_runs,
+        "slowest": [entry(test) for test in slowest],
+        "slowdowns": [entry(test) for test in slowdowns],
+        "violations": violations,
+        "tests": {test: round(seconds, 4) for test, seconds in test_durations.items()}
+    }
+
+
+def parse_instrumentation(instr_file):
+    """Load a disaster_app instrumentation dump and keep the headline numbers per operation."""
+    try:
+        with open(instr_file, "r") as f:
+            data = json.load(f)
 
-def make_report(junit_file, cov_file, output_file="final_report.json"):
-    results = parse_junit(junit_file)
+        operations = {}
+        for name, stats in data.get("operations", {}).items():
+            operations[name] = {
+                "calls": stats.get("calls", 0),
+                "failures": stats.get("failures", {}),
+                "latency_p99_ns": stats.get("latency_ns", {}).get("p99"),
+                "lock_wait_p50_ns": stats.get("lock_wait_ns", {}).get("p50"),
+                "lock_wait_p99_ns": stats.get("lock_wait_ns", {}).get("p99"),
+                "lock_hold_p50_ns": stats.get("lock_hold_ns", {}).get("p50"),
+                "lock_hold_p99_ns": stats.get("lock_hold_ns", {}).get("p99"),
+                "max_pool_size": stats.get("pool_size", {}).get("max")
+            }
+        return {"timestamp": data.get("timestamp"), "operations": operations}
+    except Exception as e:
+        logging.error(f"Failed to parse instrumentation file {instr_file}: {e}")
+        return {"timestamp": None, "operations": {}}
+
+
+def make_report(junit_file, cov_file, output_file="final_report.json", bench_file=None, instr_file=None,
+                regression_threshold=3.0, duration_limits=None):
+    results = parse_results(junit_file)
     coverage = parse_coverage(cov_file)
 
     final_report = {
         "timestamp": datetime.utcnow().isoformat(),
         "summary": results["summary"],
         "failures": results["failures"],
-        "coverage": coverage
+        "coverage": coverage,
+        "duration": results.get("duration")
     }
 
     # Load history and compute deltas
-    history = load_history()
-    if history:
-        last = history[-1]
+    history = HistoryStore()
+    last = history.last()
+    if last:
         final_report["delta"] = {
             "coverage_change": f"{float(coverage['overall_coverage'].strip('%')) - float(last['coverage']['overall_coverage'].strip('%')):.1f}%",
             "passed_change": results["summary"].get("passed", 0) - last["summary"].get("passed", 0),
@@ -129,6 +445,49 @@ def make_report(junit_file, cov_file, output_file="final_report.json"):
     else:
         final_report["delta"] = {"coverage_change": "N/A", "passed_change": "N/A", "failed_change": "N/A"}
 
+    # Fold in benchmark results, compared against the last run that had some
+    if bench_file:
+        previous = history.latest("benchmarks") or {}
+        final_report["benchmarks"] = compare_benchmarks(parse_benchmarks(bench_file), previous)
+
+    # Per-test durations against the median of the last few runs
+    limits = dict(DURATION_LIMITS, **(duration_limits or {}))
+    window = limits["baseline_runs"]
+    baseline_state = history.state("durations")
+    if baseline_state is None:
+        # first run since the baselines moved into the index: seed them from runs that stored their durations
+        for run in history.tail(window):
+            if run.get("test_durations"):
+                baseline_state = update_duration_baselines(baseline_state, run["test_durations"], window)
+    final_report["durations"] = compare_durations(
+        results.get("test_durations", {}), duration_baselines(baseline_state, window),
+        baseline_runs=min(baseline_state["runs"], window) if baseline_state else 0, top=limits["top"],
+        min_slowdown=limits["min_slowdown"], max_test=limits["max_test"], max_slowdown=limits["max_slowdown"])
+    if results.get("test_durations"):
+        history.set_state("durations", update_duration_baselines(baseline_state, results["test_durations"], window))
+    if limits["max_suite"] is not None and (final_report["duration"] or 0) > limits["max_suite"]:
+        final_report["durations"]["violations"].insert(
+            0, f"suite took {final_report['duration']:.1f}s (limit {limits['max_suite']:g}s)")
+
+    # Lock contention / hot path numbers collected with DISASTER_APP_INSTRUMENT
+    if instr_file:
+        final_report["instrumentation"] = parse_instrumentation(instr_file)
+
+    # Rolling trends, checked for regressions before this run joins them
+    trends = history.state("trends")
+    if trends is None:
+        # first run since trends were added: build them from the stored runs once
+        engine = TrendEngine()
+        for run in history:
+            engine.update(run_metrics(run))
+    else:
+        engine = TrendEngine(trends)
+    metrics = run_metrics(final_report)
+    final_report["regressions"] = engine.regressions(metrics, threshold=regression_threshold)
+    engine.update(metrics)
+    final_report["trends"] = engine.summary()
+    history.set_state("trends", engine.state())
+
     # Save the current report
     out_dir = os.path.dirname(output_file) or "."
     os.makedirs(out_dir, exist_ok=True)
@@ -138,14 +497,13 @@ def make_report(junit_file, cov_file, output_file="final_report.json"):
 
     # Update history
     history.append(final_report)
-    save_history(history)
 
     logging.info(f"Final report written to {output_file}")
     print(f"[INFO] Final report written to {output_file}")
 
     # Show a quick trend summary in console
     print("\n=== Test Trend (last 5 runs) ===")
-    for run in history[-5:]:
+    for run in history.tail(5):
         ts = run["timestamp"]
         passed = run["summary"].get("passed", 0)
         failed = run["summary"].get("failed", 0)
@@ -153,14 +511,92 @@ def make_report(junit_file, cov_file, output_file="final_report.json"):
         print(f"{ts} | Passed: {passed} | Failed: {failed} | Coverage: {cov}")
     print("================================\n")
 
+    print("=== Rolling trends (mean / min / max / p90) ===")
+    for name, windows in final_report["trends"].items():
+        cells = [f"{window}: {stats['mean']} / {stats['min']} / {stats['max']} / {stats['p90']}"
+                 for window, stats in windows.items() if stats["runs"]]
+        print(f"{name} | " + " | ".join(cells or ["no data"]))
+    for regression in final_report["regressions"]:
+        print(f"[REGRESSION] {regression['metric']}: {regression['value']} vs mean {regression['baseline_mean']} "
+              f"(std {regression['baseline_std']}, last {regression['baseline_runs']} runs, score {regression['score']})")
+    print("================================\n")
+
+    durations = final_report["durations"]
+    if durations["slowest"]:
+        print(f"=== Slowest tests (baseline: median of last {durations['baseline_runs']} runs) ===")
+        for result in durations["slowest"]:
+            baseline = f"baseline {result['baseline']}s ({result['change']})" if result["baseline"] is not None else "no baseline"
+            print(f"{result['test']} | {result['duration']}s | {baseline}")
+        for result in durations["slowdowns"]:
+            print(f"[SLOWER] {result['test']} | {result['duration']}s vs {result['baseline']}s ({result['change']})")
+        for violation in durations["violations"]:
+            print(f"[TOO SLOW] {violation}")
+        print("================================\n")
 
-if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python make_report.py results.xml coverage.xml [output.json]")
-        sys.exit(1)
+    missing = [detail for detail in coverage["details"] if detail.get("missing_lines")]
+    if missing:
+        print("=== Missing lines ===")
+        for detail in missing:
+            print(f"{detail['file']} | {detail['coverage']} lines, {detail['branch_coverage']} branches | "
+                  f"missing: {detail['missing_lines']}")
+        print("================================\n")
+
+    if final_report.get("instrumentation", {}).get("operations"):
+        print("=== Hot path instrumentation ===")
+        for name, stats in final_report["instrumentation"]["operations"].items():
+            print(f"{name} | calls: {stats['calls']} | failures: {sum(stats['failures'].values())} | "
+                  f"lock wait p99: {stats['lock_wait_p99_ns']}ns | lock hold p99: {stats['lock_hold_p99_ns']}ns")
+        print("================================\n")
+
+    if final_report.get("benchmarks", {}).get("results"):
+        print("=== Benchmarks (ops/sec) ===")
+        for result in final_report["benchmarks"]["results"]:
+            print(f"{result.get('operation')} | {result.get('responders')} responders | "
+                  f"{result.get('threads')} threads | {result.get('ops_per_sec')} "
+                  f"({result['ops_per_sec_change']}) | p99 {result.get('p99_us')}us")
+        print("================================\n")
+
+    return final_report
 
-    junit_file = sys.argv[1]
-    cov_file = sys.argv[2]
-    output_file = sys.argv[3] if len(sys.argv) > 3 else "final_report.json"
 
-    make_report(junit_file, cov_file, output_file)
+def main():
+    parser = argparse.ArgumentParser(description="Combine test results, coverage and history into a final report")
+    parser.add_argument("junit_file", help="JUnit XML results (results.xml) or a runner --events stream (.jsonl)")
+    parser.add_argument("cov_file", help="Cobertura coverage XML (coverage.xml)")
+    parser.add_argument("output_file", nargs="?", default="final_report.json", help="Where to write the report")
+    parser.add_argument("--benchmarks", type=str, help="Benchmark JSON from benchmarks/bench_dispatch.py to include")
+    parser.add_argument("--instrumentation", type=str,
+                        help="Instrumentation JSON dumped by disaster_app (DISASTER_APP_INSTRUMENT) to include")
+    parser.add_argument("--regression-threshold", type=float, default=3.0,
+                        help="Standard deviations from the last-50-runs mean that count as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit with status 1 when coverage, failure rate or duration regressed")
+    parser.add_argument("--baseline-runs", type=int, default=DURATION_LIMITS["baseline_runs"],
+                        help="Per-test duration baseline is the median over this many previous runs")
+    parser.add_argument("--top", type=int, default=DURATION_LIMITS["top"],
+                        help="How many slowest tests and biggest slowdowns to report")
+    parser.add_argument("--max-suite-duration", type=float, default=DURATION_LIMITS["max_suite"],
+                        help="Exit with status 1 if the suite takes longer than this many seconds")
+    parser.add_argument("--max-test-duration", type=float, default=DURATION_LIMITS["max_test"],
+                        help="Exit with status 1 if any test takes longer than this many seconds")
+    parser.add_argument("--max-slowdown", type=float, default=DURATION_LIMITS["max_slowdown"],
+                        help="Exit with status 1 if a test takes more than this many times its baseline")
+    parser.add_argument("--min-slowdown", type=float, default=DURATION_LIMITS["min_slowdown"],
+                        help="Ignore slowdowns smaller than this many seconds")
+    args = parser.parse_args()
+
+    duration_limits = {"baseline_runs": args.baseline_runs, "top": args.top, "max_suite": args.max_suite_duration,
+                       "max_test": args.max_test_duration, "max_slowdown": args.max_slowdown,
+                       "min_slowdown": args.min_slowdown}
+    final_report = make_report(args.junit_file, args.cov_file, args.output_file,
+                               bench_file=args.benchmarks, instr_file=args.instrumentation,
+                               regression_threshold=args.regression_threshold, duration_limits=duration_limits)
+    if final_report["durations"]["violations"]:
+        return 1
+    if args.fail_on_regression and final_report["regressions"]:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""pytest plugin that streams structured results as JSON lines while the suite runs.
+
+Load it with `-p pytest_events --events-file events.jsonl` (runner.py --events does this).
+Each line is one event: session_started, test_started, test_passed / test_failed /
+test_error / test_skipped (with the test's duration so far in seconds, so a later event for
+the same test replaces an earlier one) and session_finished. Several processes can append
+to the same file, every event is written with a single append; session_started carries the
+number of workers when there are several, so readers know how many sessions to wait for.
+"""
+import json
+import os
+import time
+
+
+def pytest_addoption(parser):
+    parser.addoption("--events-file", default=None, help="Append JSON-lines test events to this file")
+    parser.addoption("--events-worker", default=None, help="Worker name to tag events with")
+    parser.addoption("--events-workers", default=None, type=int, help="Number of workers writing to the file")
+
+
+def pytest_configure(config):
+    path = config.getoption("--events-file")
+    if path:
+        stream = EventStream(path, config.getoption("--events-worker"), config.getoption("--events-workers"))
+        config.pluginmanager.register(stream, "event-stream")
+
+
+def classname(nodeid):
+    """JUnit-style classname for a node ID (tests/test_x.py::test_y -> tests.test_x)."""
+    path = nodeid.split("::")[0]
+    return path[:-3].replace("/", ".") if path.endswith(".py") else path.replace("/", ".")
+
+
+class EventStream:
+    def __init__(self, path, worker=None, workers=None):
+        self.worker = worker
+        self.workers = workers
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.started = time.time()
+        self.durations = {}
+
+    def emit(self, event, **fields):
+        record = {"event": event, "time": time.time()}
+        if self.worker is not None:
+            record["worker"] = self.worker
+        record.update(fields)
+        os.write(self.fd, (json.dumps(record) + "\n").encode())
+
+    def pytest_sessionstart(self, session):
+        if self.workers is not None:
+            self.emit("session_started", workers=self.workers)
+        else:
+            self.emit("session_started")
+
+    def pytest_runtest_logstart(self, nodeid, location):
+        self.emit("test_started", test=nodeid)
+
+    def pytest_runtest_logreport(self, report):
+        self.durations[report.nodeid] = self.durations.get(report.nodeid, 0.0) + report.duration
+        fields = {"test": report.nodeid, "classname": classname(report.nodeid)}
+        if report.failed:
+            fields["message"] = report.head_line or ""
+            fields["details"] = report.longreprtext
+            outcome = "test_failed" if report.when == "call" else "test_error"
+        elif report.skipped:
+            outcome = "test_skipped"
+            fields["message"] = report.longrepr[2] if isinstance(report.longrepr, tuple) else ""
+        elif report.when == "call":
+            outcome = "test_passed"
+        else:
+            return
+        fields["duration"] = round(self.durations[report.nodeid], 6)
+        self.emit(outcome, **fields)
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        self.emit("session_finished", exit_status=int(exitstatus), duration=round(time.time() - self.started, 6))
+        os.close(self.fd)
@@ -1,47 +1,843 @@
 import argparse
+import hashlib
+import importlib
 import json
 import os
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+import heapq
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+
+import case_engine
+from history_store import HISTORY_DIR, HistoryStore
 
 CASES_DIR = os.path.join("tests", "cases")
+CATALOG_FILE = os.path.join(".cache", "case_catalog.json")
+IMPACT_MAP_FILE = os.path.join(".cache", "impact_map.json")
+SCHEDULE_FILE = os.path.join(".cache", "test_schedule.json")
+RESULT_CACHE_FILE = os.path.join(".cache", "case_results.json")
+# what a case's outcome depends on besides the case itself
+CASE_CODE_FILES = ("disaster_app.py", "case_engine.py")
+# changes under these paths (or to these file types) can't affect test outcomes
+IMPACT_IGNORED_PREFIXES = ("docs/", "reports/", ".github/")
+IMPACT_IGNORED_SUFFIXES = (".md", ".txt", ".pdf", ".tex", ".xlsx", ".jpg")
+# run pytest from this interpreter so the repo root is importable (disaster_app)
+PYTEST = [sys.executable, "-m", "pytest"]
+
+class CaseCatalog:
+    """Persistent index of the case files (id, type, description, tags, path, hash).
+
+    Entries are keyed by file name and only re-read when a file's mtime or size changes,
+    so refreshing a catalog of tens of thousands of cases costs one directory scan.
+    """
+
+    def __init__(self, cases_dir=CASES_DIR, catalog_file=CATALOG_FILE):
+        self.cases_dir = cases_dir
+        self.catalog_file = catalog_file
+        self.entries = {}
+        self._by_id = {}
+        if os.path.exists(catalog_file):
+            try:
+                with open(catalog_file, "r") as f:
+                    data = json.load(f)
+                if isinstance(data, dict) and data.get("cases_dir") == cases_dir:
+                    self.entries = data.get("entries", {})
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def refresh(self):
+        """Re-read new or changed case files, drop deleted ones and save the catalog if anything changed."""
+        if not os.path.exists(self.cases_dir):
+            changed = bool(self.entries)
+            self.entries = {}
+        else:
+            changed = False
+            seen = set()
+            for file in os.scandir(self.cases_dir):
+                if not file.name.endswith(".json") or not file.is_file():
+                    continue
+                seen.add(file.name)
+                stat = file.stat()
+                entry = self.entries.get(file.name)
+                if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                    continue
+                self.entries[file.name] = self._index(file.path, stat)
+                changed = True
+            for name in set(self.entries) - seen:
+                del self.entries[name]
+                changed = True
+
+        if changed:
+            self.save()
+        self._by_id = {entry["id"]: entry for entry in self.entries.values()}
+        return self
+
+    def _index(self, path, stat):
+        with open(path, "rb") as f:
+            raw = f.read()
+        try:
+            case = json.loads(raw)
+        except ValueError:
+            case = {}
+        if not isinstance(case, dict):
+            # valid JSON but not a case object, index it by file name like an unreadable one
+            case = {}
+        return {
+            "id": case.get("id", os.path.basename(path)[:-5]),
+            "type": case.get("type"),
+            "description": case.get("description", ""),
+            "tags": case.get("tags", []),
+            "path": path,
+            "hash": hashlib.sha256(raw).hexdigest(),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size
+        }
 
-def list_cases():
-    """List all available test case files."""
-    if not os.path.exists(CASES_DIR):
-        return []
-    return [f for f in os.listdir(CASES_DIR) if f.endswith(".json")]
+    def save(self):
+        os.makedirs(os.path.dirname(self.catalog_file) or ".", exist_ok=True)
+        temp = self.catalog_file + ".tmp"
+        with open(temp, "w") as f:
+            json.dump({"cases_dir": self.cases_dir, "entries": self.entries}, f)
+        os.replace(temp, self.catalog_file)
+
+    def query(self, test_type=None, id_prefix=None, tag=None):
+        """Entries matching every filter given, sorted by case ID."""
+        matches = [
+            entry for entry in self.entries.values()
+            if (test_type is None or entry["type"] == test_type)
+            and (id_prefix is None or str(entry["id"]).startswith(id_prefix))
+            and (tag is None or tag in entry["tags"])
+        ]
+        return sorted(matches, key=lambda entry: str(entry["id"]))
+
+    def find(self, case_id):
+        """Entry for a case file name (without .json) or case ID, or None."""
+        entry = self.entries.get(f"{case_id}.json")
+        if entry:
+            return entry
+        return self._by_id.get(case_id)
+
+_catalog = None
+
+def get_catalog():
+    """The case catalog, refreshed the first time it's used in this process."""
+    global _catalog
+    if _catalog is None:
+        _catalog = CaseCatalog().refresh()
+    return _catalog
+
+@lru_cache(maxsize=4096)
+def read_case(path, mtime_ns):
+    """Parse a case file once per version (mtime) of it."""
+    with open(path, "r") as f:
+        return json.load(f)
 
 def load_case(case_id):
-    """Load a single case by ID (filename without .json)."""
-    case_file = os.path.join(CASES_DIR, f"{case_id}.json")
-    if not os.path.exists(case_file):
+    """Load a single case by ID (filename without .json, or the "id" inside the file)."""
+    entry = get_catalog().find(case_id)
+    if entry is None:
+        case_file = os.path.join(CASES_DIR, f"{case_id}.json")
         raise FileNotFoundError(f"Case file {case_file} not found.")
-    with open(case_file, "r") as f:
-        return json.load(f)
+    return read_case(entry["path"], entry["mtime_ns"])
+
+def load_cases(test_type=None, id_prefix=None, tag=None):
+    """Load every case matching the filters."""
+    return [read_case(entry["path"], entry["mtime_ns"])
+            for entry in get_catalog().query(test_type, id_prefix, tag)]
+
+def pytest_options(events_file=None, fail_fast=False, worker=None, workers=None):
+    """Extra pytest arguments for the structured event stream and fail-fast."""
+    options = []
+    if events_file:
+        options += ["-p", "pytest_events", f"--events-file={events_file}"]
+        if worker is not None:
+            options.append(f"--events-worker={worker}")
+        if workers is not None:
+            options.append(f"--events-workers={workers}")
+    if fail_fast:
+        options.append("-x")
+    return options
+
+_print_lock = threading.Lock()
+
+def stream_process(cmd, prefix=""):
+    """Start cmd and echo its output line by line as it runs (nothing is buffered). Returns the Popen."""
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+
+    def pump():
+        for line in process.stdout:
+            with _print_lock:
+                print(f"{prefix}{line}", end="", flush=True)
+        process.stdout.close()
+
+    process.pump = threading.Thread(target=pump, daemon=True)
+    process.pump.start()
+    return process
+
+def wait_streamed(process):
+    """Wait for a process from stream_process and for all of its output to be echoed."""
+    returncode = process.wait()
+    process.pump.join()
+    return returncode
+
+def run_pytest(test_type=None, events_file=None, fail_fast=False, junit_file=None):
+    """Run pytest, optionally filtered by test type."""
+    schedule = TestSchedule()
+    cmd = PYTEST + ["-q"] + pytest_options(events_file, fail_fast)
+
+    # collecting costs a pytest startup, so only do it when some test has failed before
+    tests = collect_tests(test_type) if schedule.failing_keys() else []
+    if tests and schedule.has_failures(map(junit_key, tests)):
+        # run the tests that failed before first for fast feedback
+        cmd += schedule.order(tests)
+        shown = f"{' '.join(PYTEST)} -q <{len(tests)} tests, previously failing first>"
+    else:
+        cmd += ["tests/"]
+        if test_type:
+            # assumes test functions are named test_*_<type>
+            cmd += ["-k", test_type]
+        shown = " ".join(cmd)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results_file = junit_file or os.path.join(tmp, "results.xml")
+        cmd.append(f"--junitxml={results_file}")
+        print(f"[INFO] Executing: {shown}", flush=True)
+        returncode = wait_streamed(stream_process(cmd))
+        record_schedule(schedule, results_file)
+
+    if returncode == 0:
+        print("[INFO] Tests passed.")
+    else:
+        print("[ERROR] Tests failed.")
+    return returncode
+
+def record_schedule(schedule, junit_file):
+    """Fold a run's JUnit results into the schedule model and save it."""
+    try:
+        schedule.record_junit(junit_file)
+    except (OSError, ET.ParseError):
+        return
+    schedule.save()
+
+def case_event(result):
+    """The event stream record for a case result (same format as pytest_events)."""
+    event = {"event": f"test_{result['status']}", "time": time.time(), "test": f"cases::{result['id']}",
+             "classname": f"cases.{result['type']}", "duration": round(result["time"], 6)}
+    if result["status"] != "passed":
+        event.update(message=result["message"], details=result["details"])
+    return event
+
+def run_cases(cases, jobs=1, junit_file=None, events_file=None, fail_fast=False, use_cache=True):
+    """Run JSON cases in-process with the case engine (split over `jobs` processes if > 1).
+
+    Unchanged cases replay their cached result unless use_cache is False.
+    """
+    if not cases:
+        print("[ERROR] No cases to run.")
+        return 1
+
+    events = open(events_file, "a") if events_file else None
+
+    def report(result):
+        cached = " (cached)" if result.get("cached") else ""
+        print(f"[{result['status'].upper()}] {result['id']}: {result['description']}{cached}", flush=True)
+        if result["status"] not in ("passed", "skipped"):
+            print(f"    {result['message']}", flush=True)
+        if events:
+            events.write(json.dumps(case_event(result)) + "\n")
+            events.flush()
+
+    schedule = TestSchedule()
+    cache = ResultCache() if use_cache else None
+    started = time.perf_counter()
+    if events:
+        events.write(json.dumps({"event": "session_started", "time": time.time()}) + "\n")
+
+    results, pending = [], []
+    for case in schedule.order(cases, key=case_key):
+        hit = cache.get(case) if cache else None
+        if hit:
+            report(hit)
+            results.append(hit)
+        else:
+            pending.append(case)
+    stop = fail_fast and any(result["status"] == "failed" for result in results)
+
+    ran = []
+    if pending and not stop:
+        if jobs > 1 and len(pending) > 1 and not fail_fast:
+            shards = schedule.pack(pending, jobs, key=case_key)
+            with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+                for shard, shard_results in zip(shards, pool.map(case_engine.run_cases, shards)):
+                    for result in shard_results:
+                        report(result)
+                    ran.extend(zip(shard, shard_results))
+        else:
+            ran = list(zip(pending, case_engine.run_cases(pending, on_result=report, fail_fast=fail_fast)))
+    elapsed = time.perf_counter() - started
+
+    for case, result in ran:
+        schedule.record(case_key(result), result["status"], result["time"])
+        if cache:
+            cache.put(case, result)
+        results.append(result)
+    schedule.save()
+    if cache:
+        cache.save()
+    failed = sum(result["status"] in ("failed", "error") for result in results)
+    replayed = sum(bool(result.get("cached")) for result in results)
+    print(f"[INFO] {len(results)} cases in {elapsed:.3f}s ({len(results) - failed} passed, {failed} failed"
+          f"{f', {replayed} from cache' if replayed else ''})")
+    if events:
+        events.write(json.dumps({"event": "session_finished", "time": time.time(), "exit_status": 1 if failed else 0,
+                                 "duration": round(elapsed, 6)}) + "\n")
+        events.close()
+
+    if junit_file:
+        case_engine.write_junit(results, junit_file)
+        print(f"[INFO] JUnit results written to {junit_file}")
+    return 1 if failed else 0
+
+def junit_key(nodeid):
+    """The JUnit classname::name a pytest node ID is reported under (tests/test_x.py::test_y -> tests.test_x::test_y)."""
+    path, *names = nodeid.split("::")
+    module = path[:-3] if path.endswith(".py") else path
+    return "::".join([".".join([module.replace("/", ".")] + names[:-1]), names[-1] if names else ""])
+
+def case_key(case):
+    """The JUnit classname::name a JSON case is reported under."""
+    return f"cases.{case.get('type')}::{case.get('id')}"
+
+class TestSchedule:
+    """Per-test duration and failure model used to order and shard runs.
+
+    Every run through the runner records each test's status and JUnit time (durations
+    are a moving average); the failures recorded in the report history count too, so
+    plain CI runs feed the model. Tests are keyed by their JUnit classname::name.
+    """
+
+    __test__ = False  # not a pytest test class
+
+    # weight of the newest duration in the moving average
+    SMOOTHING = 0.3
+
+    def __init__(self, schedule_file=SCHEDULE_FILE, history_dir=HISTORY_DIR):
+        self.schedule_file = schedule_file
+        self.tests = {}
+        if os.path.exists(schedule_file):
+            try:
+                with open(schedule_file, "r") as f:
+                    self.tests = json.load(f)
+            except (OSError, ValueError):
+                self.tests = {}
+        self.history_runs = 0
+        self.history_failures = {}
+        self.history_last = {}
+        self.history_latest = ""
+        self._load_history(history_dir)
+
+    def _load_history(self, history_dir):
+        # only the index is read: run count, last run and per-test failure counts
+        try:
+            history = HistoryStore(history_dir, legacy_file="")
+            failures = history.test_failures()
+            last = history.last()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[WARN] Ignoring unreadable run history in {history_dir}: {e}")
+            return
+        self.history_runs = len(history)
+        self.history_failures = {key: entry["count"] for key, entry in failures.items()}
+        self.history_last = {key: entry["last"] for key, entry in failures.items()}
+        if last:
+            self.history_latest = last.get("timestamp") or ""
+
+    def record(self, key, status, duration):
+        """Fold one result (passed/failed/error/skipped, seconds) into the model."""
+        entry = self.tests.setdefault(key, {"runs": 0, "failures": 0, "duration": None, "last": None})
+        if status == "skipped":
+            return
+        entry["runs"] += 1
+        entry["failures"] += status in ("failed", "error")
+        entry["last"] = status
+        entry["updated"] = datetime.utcnow().isoformat()
+        if entry["duration"] is None:
+            entry["duration"] = duration
+        else:
+            entry["duration"] += self.SMOOTHING * (duration - entry["duration"])
+
+    def record_junit(self, junit_file):
+        """Record every testcase in a JUnit XML file."""
+        root = ET.parse(junit_file).getroot()
+        for testcase in root.iter("testcase"):
+            if testcase.find("failure") is not None:
+                status = "failed"
+            elif testcase.find("error") is not None:
+                status = "error"
+            elif testcase.find("skipped") is not None:
+                status = "skipped"
+            else:
+                status = "passed"
+            key = f"{testcase.attrib.get('classname')}::{testcase.attrib.get('name')}"
+            self.record(key, status, float(testcase.attrib.get("time", 0)))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.schedule_file) or ".", exist_ok=True)
+        temp = self.schedule_file + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(self.tests, f)
+        os.replace(temp, self.schedule_file)
+
+    def last_failed(self, key):
+        """Whether the most recent result seen for the test (runner or history) was a failure."""
+        entry = self.tests.get(key, {})
+        if entry.get("last") and entry.get("updated", "") > self.history_latest:
+            return entry["last"] in ("failed", "error")
+        return bool(self.history_latest) and self.history_last.get(key) == self.history_latest
+
+    def failure_rate(self, key):
+        entry = self.tests.get(key, {})
+        runs = entry.get("runs", 0) + (self.history_runs if key in self.history_failures else 0)
+        failures = entry.get("failures", 0) + self.history_failures.get(key, 0)
+        return failures / runs if runs else 0.0
 
-def run_pytest(test_type=None, case_id=None):
-    """Run pytest with filters for test type or case ID."""
-    cmd = ["pytest", "tests/", "-q"]
+    def failing_keys(self):
+        """Keys of the pytest tests (not cases) with any recorded failure."""
+        keys = {key for key, entry in self.tests.items() if entry.get("failures")}
+        keys.update(self.history_failures)
+        return {key for key in keys if not key.startswith("cases.")}
 
+    def has_failures(self, keys):
+        return any(self.failure_rate(key) for key in keys)
+
+    def duration(self, key, default=None):
+        entry = self.tests.get(key)
+        if entry and entry["duration"] is not None:
+            return entry["duration"]
+        return default
+
+    def order(self, tests, key=junit_key):
+        """Tests that failed last time first, then by failure rate; otherwise collection order is kept."""
+        return sorted(tests, key=lambda test: (not self.last_failed(key(test)), -self.failure_rate(key(test))))
+
+    def pack(self, tests, jobs, key=junit_key):
+        """Split tests into at most `jobs` shards, longest first onto the least loaded shard.
+
+        Tests without a recorded duration count as the median known duration. Each shard
+        is then ordered failed-first.
+        """
+        known = sorted(d for d in (self.duration(key(test)) for test in tests) if d is not None)
+        default = known[len(known) // 2] if known else 1.0
+        timed = [(self.duration(key(test), default), i, test) for i, test in enumerate(tests)]
+        timed.sort(key=lambda item: (-item[0], item[1]))
+
+        jobs = max(1, min(jobs, len(tests)))
+        loads = [(0.0, shard) for shard in range(jobs)]
+        shards = [[] for _ in range(jobs)]
+        for duration, _, test in timed:
+            load, shard = heapq.heappop(loads)
+            shards[shard].append(test)
+            heapq.heappush(loads, (load + duration, shard))
+        return [self.order(shard, key) for shard in shards if shard]
+
+class ResultCache:
+    """Case results keyed by a hash of everything that decides them.
+
+    The key covers the case JSON, the disaster_app and case_engine sources and the
+    Python version, so any change to those reruns the case. Cases marked
+    "nondeterministic": true are never cached. Only passes and failures are stored
+    (errors may be environmental); least recently used entries are evicted past
+    max_entries.
+    """
+
+    def __init__(self, cache_file=RESULT_CACHE_FILE, max_entries=10000, code_files=CASE_CODE_FILES):
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.entries = {}
+        self.changed = False
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+        code = hashlib.sha256(sys.version.encode())
+        for path in code_files:
+            code.update(path.encode())
+            code.update(file_hash(path).encode() if os.path.exists(path) else b"")
+        self.code_hash = code.hexdigest()
+
+    def key(self, case):
+        raw = json.dumps(case, sort_keys=True).encode()
+        return hashlib.sha256(self.code_hash.encode() + raw).hexdigest()
+
+    def get(self, case):
+        """The cached result for a case (marked cached), or None."""
+        if case.get("nondeterministic"):
+            return None
+        key = self.key(case)
+        result = self.entries.pop(key, None)
+        if result is None:
+            return None
+        # most recently used entries live at the end
+        self.entries[key] = result
+        self.changed = True
+        return dict(result, cached=True)
+
+    def put(self, case, result):
+        if case.get("nondeterministic") or result["status"] not in ("passed", "failed"):
+            return
+        key = self.key(case)
+        self.entries.pop(key, None)
+        self.entries[key] = {k: v for k, v in result.items() if k != "cached"}
+        self.changed = True
+
+    def save(self):
+        if not self.changed:
+            return
+        for key in list(self.entries)[:max(0, len(self.entries) - self.max_entries)]:
+            del self.entries[key]
+        os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+        temp = self.cache_file + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(temp, self.cache_file)
+        self.changed = False
+
+def collect_tests(test_type=None):
+    """Collect pytest node IDs (optionally filtered by test type) without running them."""
+    cmd = PYTEST + ["tests/", "--collect-only", "-q"]
     if test_type:
-        # assumes test functions are named test_*_<type>
         cmd += ["-k", test_type]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return [line.strip() for line in result.stdout.splitlines() if "::" in line]
 
-    if case_id:
-        case_data = load_case(case_id)
-        print(f"[INFO] Running case {case_id}: {case_data.get('description', '')}")
-        
+def merge_junit(shard_files, junit_file, elapsed=None):
+    """Merge per-shard JUnit XML files into one <testsuite> that make_report.parse_junit can read.
 
-    print(f"[INFO] Executing: {' '.join(cmd)}")
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    print(result.stdout)
-    print(result.stderr, file=sys.stderr)
+    The suite time is `elapsed` (the wall clock of the parallel run) when given; the shards ran
+    side by side, so otherwise it is the slowest shard's time, not their sum.
+    """
+    totals = {"tests": 0, "failures": 0, "errors": 0, "skipped": 0}
+    slowest = 0.0
+    merged = ET.Element("testsuite", name="pytest")
+
+    for shard_file in shard_files:
+        if not os.path.exists(shard_file):
+            # the worker died (or was stopped by --fail-fast) before writing its results
+            print(f"[WARN] No results from {os.path.basename(shard_file)}, its tests are missing from {junit_file}")
+            continue
+        root = ET.parse(shard_file).getroot()
+        suites = root.iter("testsuite") if root.tag == "testsuites" else [root]
+        for suite in suites:
+            for key in totals:
+                totals[key] += int(suite.attrib.get(key, 0))
+            slowest = max(slowest, float(suite.attrib.get("time", 0)))
+            merged.extend(suite.findall("testcase"))
+
+    for key, value in totals.items():
+        merged.set(key, str(value))
+    merged.set("time", f"{slowest if elapsed is None else elapsed:.3f}")
+    root = ET.Element("testsuites", name="pytest tests")
+    root.append(merged)
+    ET.ElementTree(root).write(junit_file, encoding="utf-8", xml_declaration=True)
+    return totals
+
+def run_parallel(jobs, test_type=None, junit_file="results.xml", tests=None, events_file=None, fail_fast=False):
+    """Run the suite (or just `tests`) split across `jobs` pytest processes and merge their JUnit results."""
+    if tests is None:
+        tests = collect_tests(test_type)
+    if not tests:
+        print("[ERROR] No tests collected.")
+        return 1
+    schedule = TestSchedule()
+    shards = schedule.pack(tests, jobs)
+    print(f"[INFO] Running {len(tests)} tests across {len(shards)} workers", flush=True)
+
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        shard_files = [os.path.join(tmp, f"shard-{i}.xml") for i in range(len(shards))]
+        processes = []
+        for i, shard in enumerate(shards):
+            # the cache provider is shared between workers, so leave it out
+            cmd = (PYTEST + ["-q", "-p", "no:cacheprovider", f"--junitxml={shard_files[i]}"]
+                   + pytest_options(events_file, fail_fast, worker=i, workers=len(shards)) + shard)
+            processes.append(stream_process(cmd, prefix=f"[worker {i}] "))
+
+        returncodes = [None] * len(processes)
+        while None in returncodes:
+            for i, process in enumerate(processes):
+                if returncodes[i] is None and process.poll() is not None:
+                    returncodes[i] = wait_streamed(process)
+                    if fail_fast and returncodes[i] != 0:
+                        # first failure: stop the other workers
+                        for other in processes:
+                            if other.poll() is None:
+                                other.terminate()
+            time.sleep(0.01)
+
+        totals = merge_junit(shard_files, junit_file, elapsed=time.perf_counter() - started)
+    record_schedule(schedule, junit_file)
 
-    if result.returncode == 0:
+    print(f"[INFO] Merged results written to {junit_file}")
+    for i, code in enumerate(returncodes):
+        if code < 0:
+            print(f"[ERROR] Worker {i} was killed by signal {-code}.")
+    # any nonzero code fails the run; a killed worker's is negative, so max() would hide it
+    returncode = next((code if code > 0 else 1 for code in returncodes if code != 0), 0)
+    if returncode == 0:
+        print("[INFO] Tests passed.")
+    else:
+        print(f"[ERROR] Tests failed ({totals['failures']} failures, {totals['errors']} errors).")
+    return returncode
+
+def run_selected(tests, jobs=1, junit_file=None, events_file=None, fail_fast=False):
+    """Run only the given pytest node IDs."""
+    if not tests:
+        print("[INFO] No tests selected.")
+        return 0
+    if jobs > 1:
+        return run_parallel(jobs, junit_file=junit_file or "results.xml", tests=tests,
+                            events_file=events_file, fail_fast=fail_fast)
+
+    schedule = TestSchedule()
+    cmd = PYTEST + ["-q"] + pytest_options(events_file, fail_fast) + schedule.order(tests)
+    with tempfile.TemporaryDirectory() as tmp:
+        results_file = junit_file or os.path.join(tmp, "results.xml")
+        cmd.append(f"--junitxml={results_file}")
+        print(f"[INFO] Executing: {' '.join(PYTEST)} -q <{len(tests)} selected tests>", flush=True)
+        returncode = wait_streamed(stream_process(cmd))
+        record_schedule(schedule, results_file)
+    if returncode == 0:
         print("[INFO] Tests passed.")
     else:
         print("[ERROR] Tests failed.")
+    return returncode
+
+def git(*args):
+    """Run a git command and return its stdout, or None if it fails."""
+    result = subprocess.run(["git", *args], capture_output=True, text=True)
+    return result.stdout if result.returncode == 0 else None
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def record_impact_map(impact_file=IMPACT_MAP_FILE):
+    """Run the suite with per-test coverage contexts and save which source lines each test runs."""
+    from coverage import CoverageData
+
+    os.makedirs(os.path.dirname(impact_file) or ".", exist_ok=True)
+    data_file = os.path.join(os.path.dirname(impact_file) or ".", ".coverage.impact")
+    cmd = PYTEST + ["tests/", "-q", "-p", "no:cacheprovider", "--cov=.", "--cov-context=test", "--cov-report="]
+    print("[INFO] Recording per-test coverage contexts")
+    result = subprocess.run(cmd, capture_output=True, text=True, env=dict(os.environ, COVERAGE_FILE=data_file))
+    if result.returncode != 0:
+        print(result.stdout)
+        print("[WARN] Some tests failed while recording, their coverage is still mapped.")
+
+    data = CoverageData(basename=data_file)
+    data.read()
+    tests = {}
+    module_level = {}
+    sources = {}
+    root = os.getcwd()
+    for measured in data.measured_files():
+        path = os.path.relpath(measured, root).replace(os.sep, "/")
+        if path.startswith("tests/") or path.startswith(".."):
+            continue
+        sources[path] = file_hash(measured)
+        for line, contexts in data.contexts_by_lineno(measured).items():
+            for context in contexts:
+                test = context.split("|")[0]
+                if test:
+                    tests.setdefault(test, {}).setdefault(path, []).append(line)
+                else:
+                    # runs at import time, so every test depends on it
+                    module_level.setdefault(path, []).append(line)
+    os.remove(data_file)
+
+    impact_map = {"commit": (git("rev-parse", "HEAD") or "").strip(), "sources": sources,
+                  "module_level": module_level, "tests": tests}
+    with open(impact_file, "w") as f:
+        json.dump(impact_map, f)
+    print(f"[INFO] Impact map for {len(tests)} tests written to {impact_file}")
+    return impact_map
+
+def changed_lines(ref):
+    """What changed since `ref`, as {path: (replaced, touched)} line numbers in ref's version of the file.
+
+    `replaced` are lines modified or deleted, `touched` adds the lines either side of pure insertions.
+    New files map to None. Returns None if git can't diff against ref.
+    """
+    diff = git("diff", "-U0", "--no-color", "--no-renames", ref, "--")
+    if diff is None:
+        return None
+    changes = parse_diff(diff)
+    # untracked sources and cases are changes too; other untracked files are build artifacts
+    # (results.xml, coverage.xml, benchmark.json, ...) that can't affect a test
+    for path in (git("ls-files", "--others", "--exclude-standard") or "").splitlines():
+        if path.endswith(".py") or path.startswith(CASES_DIR.replace(os.sep, "/") + "/"):
+            changes.setdefault(path, None)
+    return changes
+
+def parse_diff(diff):
+    """{path: (replaced, touched)} from `git diff -U0` output, None for new files (see changed_lines)."""
+    changes = {}
+    path = None
+    for line in diff.splitlines():
+        if line.startswith("--- "):
+            path = line[6:] if line.startswith("--- a/") else None
+            if path:
+                changes[path] = (set(), set())
+        elif line.startswith("+++ ") and path is None and line.startswith("+++ b/"):
+            changes[line[6:]] = None
+        elif line.startswith("@@") and path:
+            replaced, touched = changes[path]
+            start, _, count = line.split()[1][1:].partition(",")
+            start, count = int(start), int(count or 1)
+            if count:
+                replaced.update(range(start, start + count))
+                touched.update(range(start, start + count))
+            else:
+                # pure insertion after `start`
+                touched.update((start, start + 1))
+    return changes
+
+def select_impacted_tests(ref, impact_file=IMPACT_MAP_FILE):
+    """Node IDs of the tests affected by changes since `ref`, or None if the full suite must run."""
+    if not os.path.exists(impact_file):
+        print("[INFO] No impact map yet, running the full suite.")
+        return None
+    with open(impact_file, "r") as f:
+        impact_map = json.load(f)
+
+    changes = changed_lines(ref)
+    if changes is None:
+        print(f"[INFO] Could not diff against {ref}, running the full suite.")
+        return None
+
+    # the map's line numbers are only meaningful for the version of each file it was recorded on
+    for path, digest in impact_map["sources"].items():
+        at_ref = subprocess.run(["git", "show", f"{ref}:{path}"], capture_output=True)
+        if at_ref.returncode != 0 or hashlib.sha256(at_ref.stdout).hexdigest() != digest:
+            print(f"[INFO] Impact map is stale for {path}, running the full suite.")
+            return None
+
+    all_tests = collect_tests()
+    selected = set()
+    for path, change in changes.items():
+        if path.startswith(IMPACT_IGNORED_PREFIXES) or path.endswith(IMPACT_IGNORED_SUFFIXES):
+            continue
+        if path.startswith("tests/") and os.path.basename(path).startswith("test_") and path.endswith(".py"):
+            selected.update(test for test in all_tests if test.startswith(f"{path}::"))
+            continue
+        if path not in impact_map["sources"] or change is None:
+            print(f"[INFO] {path} changed and isn't in the impact map, running the full suite.")
+            return None
+
+        replaced, touched = change
+        if replaced & set(impact_map["module_level"].get(path, [])):
+            print(f"[INFO] Module level code in {path} changed, running the full suite.")
+            return None
+        for test, covered in impact_map["tests"].items():
+            if not touched.isdisjoint(covered.get(path, [])):
+                selected.add(test)
+
+    # tests the map has never seen have no coverage recorded, so run them too
+    selected.update(test for test in all_tests if test not in impact_map["tests"])
+    return [test for test in all_tests if test in selected]
+
+def watched_files():
+    """{path: mtime_ns} for the repo's modules, the test modules and the case files."""
+    files = {}
+    for directory, suffix in ((".", ".py"), ("tests", ".py"), (CASES_DIR, ".json")):
+        if not os.path.isdir(directory):
+            continue
+        for file in os.scandir(directory):
+            if file.name.endswith(suffix) and file.is_file():
+                files[os.path.normpath(file.path)] = file.stat().st_mtime_ns
+    return files
+
+def _reloadable(name, module):
+    """Whether importlib.reload can take the module: not runner itself, nor the script (__main__) or anything without a spec."""
+    return name not in ("runner", "__main__") and getattr(module, "__spec__", None) is not None
+
+def reload_changed(paths):
+    """Reload the changed repo modules (and loaded modules that import them), return their names."""
+    changed = {os.path.basename(path)[:-3] for path in paths if os.path.dirname(path) == "" and path.endswith(".py")}
+    reloaded = []
+    for name in sorted(changed):
+        if name == "runner":
+            print("[WARN] runner.py changed, restart --watch to pick it up.")
+        elif name in sys.modules and _reloadable(name, sys.modules[name]):
+            importlib.reload(sys.modules[name])
+            reloaded.append(name)
+    # modules that did `import x` / `from x import ...` still point at the old code
+    root = os.getcwd()
+    for name, module in list(sys.modules.items()):
+        module_file = getattr(module, "__file__", None)
+        if name in reloaded or not _reloadable(name, module) or not module_file or os.path.dirname(module_file) != root:
+            continue
+        if any(getattr(value, "__module__", None) in reloaded or getattr(value, "__name__", None) in reloaded
+               for value in vars(module).values()):
+            importlib.reload(module)
+            reloaded.append(name)
+    return reloaded
+
+def run_pytest_in_process(targets):
+    """Run pytest inside this interpreter, re-importing the test modules so they see reloaded code."""
+    import pytest
+
+    for name in [name for name in sys.modules if name.startswith("tests.") or name.startswith("test_")]:
+        del sys.modules[name]
+    return pytest.main(["-q", "-p", "no:cacheprovider", *targets])
+
+def watch(interval=0.5):
+    """Keep a warm interpreter, rerunning only what a change affects until interrupted."""
+    import disaster_app  # noqa: F401 -- loaded once here, reloaded when it changes
+    import pytest  # noqa: F401
+
+    print("[INFO] Watching for changes (Ctrl+C to stop)")
+    seen = {}
+    try:
+        while True:
+            current = watched_files()
+            changed = [path for path, mtime in current.items() if seen.get(path) != mtime]
+            if changed:
+                started = time.perf_counter()
+                first_run = not seen
+                seen = current
+                sources = [path for path in changed if os.path.dirname(path) == "" and path.endswith(".py")]
+                test_files = [path for path in changed if os.path.dirname(path) == "tests"]
+                case_files = [path for path in changed if path.endswith(".json")]
+                reloaded = reload_changed(sources) if not first_run else []
+                if reloaded:
+                    print(f"[INFO] Reloaded {', '.join(reloaded)}")
+
+                catalog = get_catalog().refresh()
+                if first_run or sources:
+                    # every case and test exercises the app modules
+                    cases = load_cases()
+                    targets = ["tests/"]
+                else:
+                    cases = [read_case(entry["path"], entry["mtime_ns"]) for entry in catalog.entries.values()
+                             if os.path.normpath(entry["path"]) in case_files]
+                    targets = test_files
+
+                if cases:
+                    run_cases(cases)
+                if targets:
+                    run_pytest_in_process(targets)
+                print(f"[INFO] Feedback in {time.perf_counter() - started:.2f}s, watching for changes")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        return 0
 
 def main():
     parser = argparse.ArgumentParser(description="Test Case Runner")
@@ -49,22 +845,62 @@ def main():
     parser.add_argument("--case", type=str, help="Run a specific test case by ID (JSON file name)")
     parser.add_argument("--type", type=str, choices=["unit", "integration", "system"],
                         help="Run all tests of a given type")
+    parser.add_argument("--cases", action="store_true",
+                        help="Run every JSON case in-process (filtered by --type if given)")
+    parser.add_argument("--id-prefix", type=str, help="Only list/run cases whose ID starts with this")
+    parser.add_argument("--tag", type=str, help="Only list/run cases carrying this tag")
+    parser.add_argument("--jobs", type=int, default=1, help="Split the tests across N worker processes")
+    parser.add_argument("--record-impact", action="store_true",
+                        help="Run the suite recording which source lines each test covers (for --changed-since)")
+    parser.add_argument("--changed-since", type=str, metavar="GIT_REF",
+                        help="Only run the tests whose covered lines changed since this git ref")
+    parser.add_argument("--watch", action="store_true",
+                        help="Stay running and rerun the affected cases/tests whenever sources, tests or cases change")
+    parser.add_argument("--events", type=str, metavar="PATH",
+                        help="Append a JSON-lines event stream (test started/passed/failed with durations) to PATH")
+    parser.add_argument("--fail-fast", action="store_true", help="Stop at the first failing test or case")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Rerun every case instead of replaying cached results for unchanged ones")
+    parser.add_argument("--junitxml", type=str,
+                        help="JUnit XML output (defaults to results.xml when running pytest with --jobs)")
     args = parser.parse_args()
 
     if args.list:
-        cases = list_cases()
+        entries = get_catalog().query(args.type, args.id_prefix, args.tag)
         print("Available test cases:")
-        for c in cases:
-            print(" -", c.replace(".json", ""))
-        return
+        for entry in entries:
+            print(f" - {entry['id']} [{entry['type']}] {entry['description']}")
+        return 0
+
+    if args.watch:
+        return watch()
+
+    if args.record_impact:
+        record_impact_map()
+        return 0
+
+    stream = {"events_file": args.events, "fail_fast": args.fail_fast}
+    if args.changed_since:
+        tests = select_impacted_tests(args.changed_since)
+        if tests is not None:
+            print(f"[INFO] {len(tests)} tests affected by changes since {args.changed_since}")
+            return run_selected(tests, jobs=args.jobs, junit_file=args.junitxml, **stream)
+        if args.jobs > 1:
+            return run_parallel(args.jobs, junit_file=args.junitxml or "results.xml", **stream)
+        return run_pytest(junit_file=args.junitxml, **stream)
 
     if args.case:
-        run_pytest(case_id=args.case)
+        return run_cases([load_case(args.case)], junit_file=args.junitxml, use_cache=not args.no_cache, **stream)
+    elif args.cases:
+        return run_cases(load_cases(args.type, args.id_prefix, args.tag), jobs=args.jobs,
+                         junit_file=args.junitxml, use_cache=not args.no_cache, **stream)
+    elif args.jobs > 1:
+        return run_parallel(args.jobs, test_type=args.type, junit_file=args.junitxml or "results.xml", **stream)
     elif args.type:
-        run_pytest(test_type=args.type)
+        return run_pytest(test_type=args.type, junit_file=args.junitxml, **stream)
     else:
         # default: run everything
-        run_pytest()
+        return run_pytest(junit_file=args.junitxml, **stream)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,7 +1,19 @@
 #simulating a singular full disaster response workflow to ensure parts work together
 
+import importlib
+import json
+import os
+import subprocess
+import sys
+import types
+import threading
 import pytest
-from disaster_app import parse_emergency_report, assign_responder, update_responder, send_alert
+import case_engine
+import runner
+from history_store import HistoryStore
+from trends import TrendEngine
+import make_report
+from disaster_app import parse_emergency_report, assign_responder, update_responder, send_alert, assign_responders_batch, ResponderPool, AlertSink, set_alert_sink, ResponderJournal, JournaledResponders
 
 def test_disaster_integration():
     responders = {
@@ -25,4 +37,607 @@ def test_disaster_integration():
 
     #after the emergency is dealt with, make the responder available again
     responders = update_responder(responder, "available", responders)
-    assert responders[responder] == "available"
\ No newline at end of file
+    assert responders[responder] == "available"
+
+#a burst of reports is dispatched in one go, most severe first, with the rest queued
+def test_batch_dispatch_integration():
+    reports = [
+        {"location": "NYC", "severity": 1},
+        {"location": "LA", "severity": "5"},
+        {"location": "Chicago", "severity": 3},
+    ]
+    for responders in ({"Joe":"available", "Lamar":"available"},
+                       ResponderPool({"Joe":"available", "Lamar":"available"})):
+        results = assign_responders_batch(reports, responders)
+        assert results[0] == "queued" #lowest severity misses out
+        assert {results[1], results[2]} == {"Joe", "Lamar"}
+        assert all(status == "busy" for status in responders.values())
+
+    with pytest.raises(ValueError):
+        assign_responders_batch([{"location": "NYC"}], {"Joe":"available"})
+
+
+#alerts sent through a sink still come back straight away and reach the file and subscribers
+def test_alert_sink_integration(tmp_path):
+    alert_file = tmp_path / "alerts.log"
+    received = []
+    sink = AlertSink(file=str(alert_file), log=False)
+    sink.subscribe(received.extend)
+    previous = set_alert_sink(sink)
+    try:
+        alert = send_alert("Fire reported", "NYC")
+        assert alert == "ALERT: Fire reported at NYC"
+        sink.flush()
+    finally:
+        set_alert_sink(previous)
+        sink.close()
+
+    assert received == [alert]
+    assert alert_file.read_text() == alert + "\n"
+    assert sink.stats() == {"queued": 0, "delivered": 1, "dropped": 0, "failed": 0}
+
+#a full queue reports backpressure instead of blocking the caller
+def test_alert_sink_backpressure(caplog):
+    gate = threading.Event()
+    sink = AlertSink(maxsize=1, batch_size=1, log=False)
+    sink.subscribe(lambda messages: gate.wait(5))
+    previous = set_alert_sink(sink)
+    try:
+        assert sink.publish("first")
+        while sink.stats()["queued"]:
+            threading.Event().wait(0.01) #worker picked up "first" and is stuck in the subscriber
+        assert sink.publish("second")
+        assert not sink.publish("third")
+        assert sink.dropped == 1
+        #send_alert doesn't lose a dropped alert silently
+        send_alert("Flood reported", "LA")
+        assert sink.dropped == 2
+        assert "Alert queue full, dropped: ALERT: Flood reported at LA" in caplog.text
+    finally:
+        set_alert_sink(previous)
+        gate.set()
+        sink.close()
+    assert sink.delivered == 2
+
+
+#a file that can't be written doesn't kill the worker, so flush() and close() still return
+def test_alert_sink_unwritable_file(tmp_path):
+    sink = AlertSink(maxsize=2, batch_size=1, log=False, file=str(tmp_path / "missing" / "alerts.log"))
+    received = []
+    sink.subscribe(received.extend)
+    for i in range(5):
+        sink.publish(f"alert {i}")
+    sink.flush()
+    sink.close()
+    assert sink.stats()["queued"] == 0
+    assert sink.failed == len(received) == 5 - sink.dropped
+    assert sink.delivered == 0
+
+#the nearest strategy follows responders as update_responder flips them busy and available
+def test_nearest_responder_integration():
+    responders = ResponderPool(
+        {"Joe":"available", "Lamar":"available", "Josh":"available"},
+        locations={"Joe": (0, 0), "Lamar": (10, 10), "Josh": (100, 100)},
+        places={"NYC": (9, 9)},
+        cell_size=5,
+    )
+    report = parse_emergency_report({"location": "NYC", "severity": 3})
+    responder, responders = assign_responder(report, responders, strategy="nearest")
+    assert responder == "Lamar"
+
+    far = parse_emergency_report({"location": "Somewhere", "severity": 1, "coordinates": [90, 95]})
+    assert far["coordinates"] == (90.0, 95.0)
+    assert assign_responders_batch([far, report], responders, strategy="nearest") == ["Josh", "Joe"]
+
+    update_responder("Lamar", "available", responders)
+    responder, responders = assign_responder(report, responders, strategy="nearest")
+    assert responder == "Lamar"
+
+    with pytest.raises(ValueError):
+        assign_responder({"location": "Nowhere", "severity": 1}, responders, strategy="nearest")
+
+
+#assignments survive a restart: state is rebuilt from the journal's snapshot plus the changes after it
+def test_journal_recovery_integration(tmp_path):
+    report = parse_emergency_report({"location": "NYC", "severity": 3})
+
+    journal = ResponderJournal(str(tmp_path / "pool"), batch_size=2, snapshot_every=3)
+    pool = ResponderPool({"Joe":"available", "Lamar":"available", "Josh":"available"}, journal=journal)
+    for _ in range(3):
+        responder, pool = assign_responder(report, pool)
+        update_responder(responder, "available", pool)
+    assign_responder(report, pool)
+    del pool["Josh"]
+    journal.close()
+
+    restarted = ResponderJournal(str(tmp_path / "pool"))
+    assert restarted.recover() == dict(pool)
+    restarted.close()
+
+    journal = ResponderJournal(str(tmp_path / "dict"))
+    responders = JournaledResponders(journal, {"Joe":"available", "Lamar":"busy"})
+    responder, responders = assign_responder(report, responders)
+    assert responder == "Joe"
+    journal.close()
+    with open(sorted((tmp_path / "dict").glob("journal-*.log"))[-1], "a") as f:
+        f.write("Lamar\tavail") #crashed half way through a write
+
+    restarted = ResponderJournal(str(tmp_path / "dict"))
+    assert restarted.recover() == {"Joe":"busy", "Lamar":"busy"}
+    restarted.close()
+
+
+#the change that triggers a snapshot has to be in it (or after it), not dropped with the old segment
+def test_journal_keeps_snapshot_trigger_integration(tmp_path):
+    journal = ResponderJournal(str(tmp_path / "pool"), snapshot_every=2)
+    pool = ResponderPool({"A":"available", "B":"available"}, journal=journal)
+    pool.set_status("A", "busy")
+    pool.set_status("B", "busy")
+    journal.close()
+    restarted = ResponderJournal(str(tmp_path / "pool"))
+    assert restarted.recover() == {"A":"busy", "B":"busy"}
+    restarted.close()
+
+    journal = ResponderJournal(str(tmp_path / "dict"), snapshot_every=1)
+    responders = JournaledResponders(journal, {"A":"available", "B":"available"})
+    responders["A"] = "busy"
+    del responders["B"]
+    journal.close()
+    restarted = ResponderJournal(str(tmp_path / "dict"))
+    assert restarted.recover() == {"A":"busy"}
+    restarted.close()
+
+#the responders are copied by the snapshot writer, not by the status change that made a snapshot due
+def test_journal_snapshot_copies_off_the_dispatch_path(tmp_path):
+    journal = ResponderJournal(str(tmp_path / "pool"), snapshot_every=2)
+    pool = ResponderPool({"A":"available", "B":"available", "C":"available"}, journal=journal)
+    copying, release = threading.Event(), threading.Event()
+    copy = journal._copy_source
+
+    def slow_copy():
+        copying.set()
+        release.wait(5)
+        return copy()
+
+    journal._copy_source = slow_copy
+    pool.set_status("A", "busy")
+    pool.set_status("B", "busy") #snapshot due, returns while the copy is still waiting
+    assert copying.wait(5)
+    pool.set_status("A", "available") #after the roll, lands in the new segment and maybe the snapshot
+    del pool["C"]
+    release.set()
+    journal.close()
+    restarted = ResponderJournal(str(tmp_path / "pool"))
+    assert restarted.recover() == {"A":"available", "B":"busy"}
+    restarted.close()
+
+#every JSON case in tests/cases passes when interpreted in-process by the case engine
+def test_json_cases_integration():
+    cases_dir = os.path.join(os.path.dirname(__file__), "cases")
+    cases = []
+    for name in sorted(os.listdir(cases_dir)):
+        with open(os.path.join(cases_dir, name)) as f:
+            cases.append(json.load(f))
+
+    results = case_engine.run_cases(cases)
+    assert [r["status"] for r in results] == ["passed"] * len(cases)
+
+    wrong = {"id": "X1", "type": "unit", "input": {"location": "NYC", "severity": 3}, "expected": {"location": "LA", "severity": 3}}
+    raises = {"id": "X2", "type": "unit", "input": {"location": "NYC"}, "expected_error": "ValueError"}
+    crashes = {"id": "X3", "type": "unit", "input": {"location": "NYC"}, "expected": {}}
+    assert [case_engine.run_case(case)["status"] for case in (wrong, raises, crashes)] == ["failed", "passed", "error"]
+
+def test_case_engine_streams_results_and_fails_fast():
+    ok = {"id": "S1", "type": "unit", "input": {"location": "NYC", "severity": 3}, "expected": {"location": "NYC", "severity": 3}}
+    wrong = {"id": "S2", "type": "unit", "input": {"location": "NYC", "severity": 3}, "expected": {"location": "LA", "severity": 3}}
+
+    seen = []
+    results = case_engine.run_cases([ok, wrong, ok], on_result=lambda result: seen.append(result["id"]), fail_fast=True)
+    assert seen == ["S1", "S2"]
+    assert [r["status"] for r in results] == ["passed", "failed"]
+
+def test_schedule_runs_failures_first_and_packs_longest_first(tmp_path):
+    schedule = runner.TestSchedule(str(tmp_path / "schedule.json"), str(tmp_path / "history"))
+    tests = [f"tests/test_x.py::test_{name}" for name in "abcde"]
+    for test, seconds in zip(tests, (4, 3, 2, 2, 1)):
+        schedule.record(runner.junit_key(test), "passed", seconds)
+    schedule.record("tests.test_x::test_d", "failed", 2)
+    schedule.save()
+
+    schedule = runner.TestSchedule(str(tmp_path / "schedule.json"), str(tmp_path / "history"))
+    assert schedule.order(tests)[0] == "tests/test_x.py::test_d"
+    shards = schedule.pack(tests, 2)
+    assert sorted(sum(schedule.duration(runner.junit_key(test)) for test in shard) for shard in shards) == [6, 6]
+
+def test_result_cache_replays_unchanged_cases(tmp_path):
+    code = tmp_path / "disaster_app.py"
+    code.write_text("v1")
+    cache_file = str(tmp_path / "results.json")
+    cases = [{"id": f"C{i}", "type": "unit", "input": {"location": "NYC", "severity": i}, "expected": {"location": "NYC", "severity": i}}
+             for i in range(3)]
+    random_case = dict(cases[0], id="R1", nondeterministic=True)
+
+    cache = runner.ResultCache(cache_file, max_entries=2, code_files=(str(code),))
+    for case in cases + [random_case]:
+        cache.put(case, case_engine.run_case(case))
+    cache.save()
+
+    cache = runner.ResultCache(cache_file, max_entries=2, code_files=(str(code),))
+    assert cache.get(cases[0]) is None  # evicted, least recently used
+    assert cache.get(random_case) is None
+    hit = cache.get(cases[2])
+    assert (hit["id"], hit["status"], hit["cached"]) == ("C2", "passed", True)
+
+    code.write_text("v2")
+    assert runner.ResultCache(cache_file, code_files=(str(code),)).get(cases[2]) is None
+
+def test_history_store_appends_and_migrates(tmp_path):
+    legacy = [{"timestamp": f"2025-01-0{i}", "summary": {"passed": i}, "failures": [{"test": "t", "classname": "c", "error": "e", "details": "x" * 1000}],
+               "coverage": {"overall_coverage": "90%", "details": [{"file": "a.py"}]}, "delta": {}} for i in range(1, 4)]
+    (tmp_path / "history.json").write_text(json.dumps(legacy))
+
+    store = HistoryStore(str(tmp_path / "history"), segment_size=2)
+    assert not (tmp_path / "history.json").exists()
+    assert len(store) == 3 and store.last()["timestamp"] == "2025-01-03"
+    assert "details" not in store.last()["failures"][0] and "details" not in store.last()["coverage"]
+
+    store.append(dict(legacy[0], timestamp="2025-02-01", benchmarks={"results": [1]}))
+    store.append(dict(legacy[0], timestamp="2025-02-02"))
+    store = HistoryStore(str(tmp_path / "history"))
+    assert [run["timestamp"] for run in store.tail(3)] == ["2025-01-03", "2025-02-01", "2025-02-02"]
+    assert len(list(store)) == 5 and len(store.index["segments"]) == 3
+    assert store.latest("benchmarks") == {"results": [1]}
+
+    # tail reads segments backwards, a small block at a time, without needing the whole segment
+    segment = store.index["segments"][0]
+    runs = store._read_segment(segment)
+    for n in range(4):
+        assert store._tail_segment(segment, n, block=16) == (runs[-n:] if n else [])
+    assert [run["timestamp"] for run in store.tail(10)] == [run["timestamp"] for run in store]
+
+def test_trend_engine_rolls_and_flags_regressions():
+    engine = TrendEngine()
+    for i in range(60):
+        engine.update({"coverage": 90.0 + (i % 3) * 0.5, "failure_rate": 0.0, "duration": 10.0 + i % 5})
+        engine = TrendEngine(json.loads(json.dumps(engine.state())))  # state survives the history index
+
+    summary = engine.summary()["duration"]
+    assert summary["last_10"]["runs"] == 10 and summary["last_50"]["runs"] == 50 and summary["all"]["runs"] == 60
+    assert summary["all"]["min"] == 10.0 and summary["all"]["max"] == 14.0
+    assert abs(summary["all"]["p50"] - 12.0) <= 1.0
+
+    assert engine.regressions({"coverage": 90.0, "failure_rate": 0.0, "duration": 12.0}) == []
+    flagged = engine.regressions({"coverage": 80.0, "failure_rate": 5.0, "duration": 11.0})
+    assert sorted(r["metric"] for r in flagged) == ["coverage", "failure_rate"]
+
+def test_impact_diff_parsing():
+    diff = "\n".join([
+        "diff --git a/disaster_app.py b/disaster_app.py",
+        "--- a/disaster_app.py",
+        "+++ b/disaster_app.py",
+        "@@ -10,2 +10,3 @@ def f():",
+        "-old",
+        "-old",
+        "+new",
+        "@@ -40,0 +42 @@",
+        "+inserted",
+        "diff --git a/tests/new_helper.py b/tests/new_helper.py",
+        "--- /dev/null",
+        "+++ b/tests/new_helper.py",
+        "@@ -0,0 +1 @@",
+        "+x = 1",
+    ])
+    changes = runner.parse_diff(diff)
+    assert changes["disaster_app.py"] == ({10, 11}, {10, 11, 40, 41})
+    assert changes["tests/new_helper.py"] is None
+
+def test_schedule_reads_failures_from_history_index(tmp_path):
+    store = HistoryStore(str(tmp_path / "history"))
+    failing = {"test": "test_b", "classname": "tests.test_x", "error": "boom"}
+    store.append({"timestamp": "2025-01-01", "summary": {}, "failures": [failing]})
+    store.append({"timestamp": "2025-01-02", "summary": {}, "failures": []})
+    store.append({"timestamp": "2025-01-03", "summary": {}, "failures": [failing]})
+    assert store.test_failures() == {"tests.test_x::test_b": {"count": 2, "last": "2025-01-03"}}
+
+    # the segments aren't needed, only the index
+    for segment in (tmp_path / "history").glob("runs-*.ndjson"):
+        segment.unlink()
+    schedule = runner.TestSchedule(str(tmp_path / "schedule.json"), str(tmp_path / "history"))
+    assert schedule.last_failed("tests.test_x::test_b")
+    assert schedule.order(["tests/test_x.py::test_a", "tests/test_x.py::test_b"])[0] == "tests/test_x.py::test_b"
+
+    (tmp_path / "history" / "index.json").write_text("{not json")
+    assert runner.TestSchedule(str(tmp_path / "schedule.json"), str(tmp_path / "history")).history_runs == 0
+
+def test_parse_junit_totals_every_suite(tmp_path):
+    shards = tmp_path / "shards.xml"
+    shards.write_text(
+        '<testsuites>'
+        '<testsuite tests="3" failures="1" errors="0" skipped="1">'
+        '<testcase classname="a" name="t1" time="0.5"><failure message="boom">trace</failure></testcase>'
+        '<testcase classname="a" name="t2"/><testcase classname="a" name="t3"><skipped/></testcase>'
+        '</testsuite>'
+        '<testsuite tests="2" failures="1" errors="1" skipped="0">'
+        '<testcase classname="b" name="t4"><failure message="bad">x</failure></testcase>'
+        '<testcase classname="b" name="t5"><error message="oops"/></testcase>'
+        '</testsuite>'
+        '</testsuites>')
+    results = make_report.parse_junit(str(shards))
+    assert results["summary"] == {"total": 5, "passed": 1, "failed": 2, "errors": 1, "skipped": 1}
+    assert [(f["classname"], f["test"], f["error"]) for f in results["failures"]] == [("a", "t1", "boom"), ("b", "t4", "bad")]
+
+    # a suite wrapping other suites only totals its children
+    nested = tmp_path / "nested.xml"
+    nested.write_text(
+        '<testsuite tests="3" failures="1" errors="0" skipped="0">'
+        '<testsuite tests="1" failures="1" errors="0" skipped="0">'
+        '<testcase classname="c" name="t1"><failure message="boom"/></testcase></testsuite>'
+        '<testsuite tests="2" failures="0" errors="0" skipped="0">'
+        '<testcase classname="c" name="t2"/><testcase classname="c" name="t3"/></testsuite>'
+        '</testsuite>')
+    results = make_report.parse_junit(str(nested))
+    assert results["summary"] == {"total": 3, "passed": 2, "failed": 1, "errors": 0, "skipped": 0}
+    assert [f["test"] for f in results["failures"]] == ["t1"]
+
+def test_parse_coverage_missing_ranges_and_branches(tmp_path):
+    coverage = tmp_path / "coverage.xml"
+    coverage.write_text(
+        '<coverage line-rate="0.5" branch-rate="0.75"><packages><package name="."><classes>'
+        '<class name="app.py" filename="app.py" line-rate="0.5" branch-rate="0.75">'
+        '<methods><method name="f"><lines><line number="3" hits="0"/></lines></method></methods>'
+        '<lines>'
+        '<line number="1" hits="1"/>'
+        '<line number="3" hits="0"/><line number="4" hits="0"/><line number="7" hits="0"/>'  # one run, 5-6 aren't statements
+        '<line number="8" hits="1" branch="true" condition-coverage="50% (1/2)" missing-branches="9"/>'
+        '<line number="9" hits="0"/>'
+        '<line number="10" hits="1" branch="true" condition-coverage="100% (2/2)"/>'
+        '<line number="12" hits="0"/>'
+        '</lines></class>'
+        '</classes></package></packages></coverage>')
+    result = make_report.parse_coverage(str(coverage))
+    assert result["overall_coverage"] == "50%" and result["overall_branch_coverage"] == "75%"
+    assert result["details"] == [{
+        "file": "app.py", "function": "app.py", "statements": 8, "missing": 5, "coverage": "50%",
+        "missing_lines": "3-7,9,12", "branches": 4, "branches_covered": 3, "branch_coverage": "75%",
+    }]
+
+def test_compare_durations_baselines_and_limits():
+    state = None
+    for a in (7.0, 1.0, 2.0, 9.0):
+        state = make_report.update_duration_baselines(state, {"a": a, "gone": 1.0}, window=3, keep_runs=3)
+    for _ in range(2):
+        state = make_report.update_duration_baselines(state, {"a": 2.0}, window=3, keep_runs=3)
+    state = json.loads(json.dumps(state))  # kept in the history index
+    assert state["runs"] == 6 and state["tests"]["a"] == {"seen": 6, "times": [9.0, 2.0, 2.0]}
+    assert "gone" in state["tests"]
+    state = make_report.update_duration_baselines(state, {"a": 2.0}, window=3, keep_runs=3)
+    assert "gone" not in state["tests"]  # not timed in the last 3 runs
+
+    state = None
+    for a in (7.0, 1.0, 2.0, 9.0):  # 7 falls out of the window
+        state = make_report.update_duration_baselines(state, {"a": a, "b": 1.0}, window=3)
+    durations = make_report.compare_durations({"a": 5.0, "b": 1.05, "c": 0.5}, make_report.duration_baselines(state, 3),
+                                              baseline_runs=3, top=2, min_slowdown=0.1, max_test=4.0, max_slowdown=2.0)
+    assert durations["baseline_runs"] == 3
+    assert [(r["test"], r["baseline"]) for r in durations["slowest"]] == [("a", 2.0), ("b", 1.0)]  # median of 1, 2, 9
+    assert [r["test"] for r in durations["slowdowns"]] == ["a"]  # b is only 0.05s slower
+    assert durations["violations"] == ["a took 5.00s (limit 4s)", "a took 5.00s, over 2x its 2.00s baseline"]
+    assert make_report.compare_durations({"c": 0.5}, make_report.duration_baselines(None, 3))["slowest"][0]["baseline"] is None
+
+
+def test_make_report_exits_nonzero_past_duration_limits(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "results.xml").write_text(
+        '<testsuite tests="1" failures="0" errors="0" skipped="0" time="2.0">'
+        '<testcase classname="a" name="slow" time="2.0"/></testsuite>')
+    (tmp_path / "coverage.xml").write_text('<coverage line-rate="1" branch-rate="1"/>')
+    args = ["make_report.py", "results.xml", "coverage.xml", "report.json"]
+
+    monkeypatch.setattr("sys.argv", args)
+    assert make_report.main() == 0
+    assert "a::slow | 2.0s | no baseline" in capsys.readouterr().out
+    for limit in (["--max-suite-duration", "1"], ["--max-test-duration", "1"]):
+        monkeypatch.setattr("sys.argv", args + limit)
+        assert make_report.main() == 1
+
+    (tmp_path / "results.xml").write_text(
+        '<testsuite tests="1" failures="0" errors="0" skipped="0" time="5.0">'
+        '<testcase classname="a" name="slow" time="5.0"/></testsuite>')
+    monkeypatch.setattr("sys.argv", args + ["--max-slowdown", "2"])
+    assert make_report.main() == 1
+    assert json.loads((tmp_path / "report.json").read_text())["durations"]["violations"] == [
+        "a::slow took 5.00s, over 2x its 2.00s baseline"]
+    # the baselines live in the index, stored runs don't carry every test's duration
+    store = HistoryStore()
+    assert "test_durations" not in store.last()
+    assert store.state("durations")["tests"]["a::slow"]["times"] == [2.0, 2.0, 2.0, 5.0]
+
+#--watch picks up source, test and case files, and reloads a changed module plus the modules importing from it
+def test_watch_reloads_changed_modules(tmp_path, monkeypatch):
+    (tmp_path / "tests" / "cases").mkdir(parents=True)
+    (tmp_path / "tests" / "cases" / "C1.json").write_text("{}")
+    (tmp_path / "tests" / "test_w.py").write_text("")
+    (tmp_path / "tests" / "notes.txt").write_text("")
+    (tmp_path / "watched_a.py").write_text("def value():\n    return 1\n")
+    (tmp_path / "watched_b.py").write_text("from watched_a import value\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    assert sorted(runner.watched_files()) == [os.path.join("tests", "cases", "C1.json"), os.path.join("tests", "test_w.py"),
+                                              "watched_a.py", "watched_b.py"]
+
+    for name in ("watched_a", "watched_b"):
+        monkeypatch.setitem(sys.modules, name, importlib.import_module(name))  # dropped again afterwards
+    watched_a, watched_b = sys.modules["watched_a"], sys.modules["watched_b"]
+    # the script runner was started as, importing from the changed module but not reloadable
+    script = types.ModuleType("__main__")
+    script.__file__, script.value = str(tmp_path / "runner.py"), watched_a.value
+    monkeypatch.setitem(sys.modules, "__main__", script)
+    (tmp_path / "watched_a.py").write_text("def value():\n    return 2\n")
+    os.utime(tmp_path / "watched_a.py", ns=(1, 1))  # a fresh mtime, so the reload doesn't reuse the cached bytecode
+
+    assert runner.reload_changed(["watched_a.py"]) == ["watched_a", "watched_b"]
+    assert watched_b.value() == 2
+    assert script.value() == 1
+
+#the pytest plugin's events carry a test's duration so far, so a teardown error isn't counted twice
+def test_pytest_events_plugin_and_parse_events(tmp_path):
+    (tmp_path / "test_sample.py").write_text(
+        "import pytest\n"
+        "@pytest.fixture\n"
+        "def broken():\n"
+        "    yield\n"
+        "    raise RuntimeError('teardown')\n"
+        "def test_ok():\n"
+        "    pass\n"
+        "def test_teardown(broken):\n"
+        "    pass\n"
+        "def test_bad():\n"
+        "    assert False\n"
+        "def test_skip():\n"
+        "    pytest.skip('later')\n")
+    events_file = tmp_path / "events.jsonl"
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    subprocess.run(runner.PYTEST + ["-q", "-p", "no:cacheprovider"] + runner.pytest_options(str(events_file), worker=0, workers=1)
+                   + ["test_sample.py"], cwd=tmp_path, env=env, capture_output=True)
+
+    events = list(make_report.iter_events(str(events_file)))
+    assert (events[0]["event"], events[0]["workers"], events[-1]["event"]) == ("session_started", 1, "session_finished")
+    assert all(event["worker"] == "0" for event in events)
+    teardown = [event for event in events if event.get("test") == "test_sample.py::test_teardown" and event["event"] != "test_started"]
+    assert [event["event"] for event in teardown] == ["test_passed", "test_error"]
+    assert teardown[1]["duration"] >= teardown[0]["duration"]
+
+    results = make_report.parse_events(str(events_file))
+    assert results["summary"] == {"total": 4, "passed": 1, "failed": 1, "errors": 1, "skipped": 1}
+    assert [f["test"] for f in results["failures"]] == ["test_bad"]
+    assert results["test_durations"]["test_sample::test_teardown"] == teardown[1]["duration"]
+
+#following a parallel run waits for every worker's session, even one that starts after another has finished
+def test_iter_events_follow_waits_for_every_worker(tmp_path):
+    events_file = tmp_path / "events.jsonl"
+
+    def session(worker):
+        return "".join(json.dumps(event) + "\n" for event in (
+            {"event": "session_started", "worker": worker, "workers": 2},
+            {"event": "test_passed", "worker": worker, "test": f"t{worker}", "classname": "c", "duration": 0.5},
+            {"event": "session_finished", "worker": worker}))
+
+    def start_late_worker():
+        with events_file.open("a") as f:
+            f.write(session(1))
+
+    events_file.write_text(session(0))
+    late = threading.Timer(0.1, start_late_worker)
+    late.start()
+    events = list(make_report.iter_events(str(events_file), follow=True, poll=0.01))
+    late.join()
+    assert [(event["event"], event["worker"]) for event in events][-3:] == [
+        ("session_started", 1), ("test_passed", 1), ("session_finished", 1)]
+    assert make_report.parse_events(str(events_file))["duration"] == 1.0
+
+#shard results merge into one suite parse_junit can total, timed by the wall clock rather than summed
+def test_merge_junit_shards(tmp_path, capsys):
+    shards = [tmp_path / f"shard-{i}.xml" for i in range(3)]
+    shards[0].write_text(
+        '<testsuites><testsuite tests="2" failures="1" errors="0" skipped="0" time="3.0">'
+        '<testcase classname="a" name="t1" time="1.0"><failure message="boom"/></testcase>'
+        '<testcase classname="a" name="t2" time="2.0"/></testsuite></testsuites>')
+    shards[1].write_text(
+        '<testsuite tests="2" failures="0" errors="1" skipped="1" time="2.5">'
+        '<testcase classname="b" name="t3"><error message="oops"/></testcase>'
+        '<testcase classname="b" name="t4"><skipped/></testcase></testsuite>')
+    merged = str(tmp_path / "results.xml")
+
+    assert runner.merge_junit([str(shard) for shard in shards], merged) == {"tests": 4, "failures": 1, "errors": 1, "skipped": 1}
+    assert "No results from shard-2.xml" in capsys.readouterr().out
+    results = make_report.parse_junit(merged)
+    assert results["summary"] == {"total": 4, "passed": 1, "failed": 1, "errors": 1, "skipped": 1}
+    assert results["duration"] == 3.0  # the slowest shard, they ran side by side
+
+    runner.merge_junit([str(shard) for shard in shards], merged, elapsed=3.25)
+    assert make_report.parse_junit(merged)["duration"] == 3.25
+
+#a worker killed by a signal fails the run even though its return code is negative
+def test_run_parallel_fails_when_a_worker_is_killed(tmp_path, monkeypatch, capsys):
+    (tmp_path / "test_par.py").write_text("def test_a():\n    pass\ndef test_b():\n    pass\n")
+    monkeypatch.chdir(tmp_path)
+    start = runner.stream_process
+
+    def kill_worker_b(cmd, prefix=""):
+        if "test_par.py::test_b" in cmd:
+            cmd = [sys.executable, "-c", "import os, signal; os.kill(os.getpid(), signal.SIGKILL)"]
+        return start(cmd, prefix)
+
+    monkeypatch.setattr(runner, "stream_process", kill_worker_b)
+    assert runner.run_parallel(2, junit_file="results.xml", tests=["test_par.py::test_a", "test_par.py::test_b"]) == 1
+    out = capsys.readouterr().out
+    assert "was killed by signal" in out and "No results from" in out
+    assert make_report.parse_junit("results.xml")["summary"]["total"] == 1
+
+#the case catalog only re-reads changed files, drops deleted ones and tolerates files that aren't case objects
+def test_case_catalog_refresh_query_and_find(tmp_path):
+    cases = tmp_path / "cases"
+    cases.mkdir()
+    (cases / "a.json").write_text(json.dumps({"id": "U1", "type": "unit", "tags": ["fast"]}))
+    (cases / "b.json").write_text(json.dumps({"id": "S1", "type": "system", "description": "whole flow"}))
+    (cases / "list.json").write_text("[1, 2]")
+    (cases / "broken.json").write_text("{not json")
+    (cases / "notes.txt").write_text("not a case")
+    catalog_file = str(tmp_path / "catalog.json")
+
+    catalog = runner.CaseCatalog(str(cases), catalog_file).refresh()
+    assert sorted(catalog.entries) == ["a.json", "b.json", "broken.json", "list.json"]
+    assert (catalog.entries["list.json"]["id"], catalog.entries["list.json"]["type"]) == ("list", None)
+    assert [entry["id"] for entry in catalog.query(test_type="unit")] == ["U1"]
+    assert [entry["id"] for entry in catalog.query(id_prefix="S")] == ["S1"]
+    assert [entry["id"] for entry in catalog.query(tag="fast")] == ["U1"]
+    assert catalog.find("S1")["path"] == catalog.find("b")["path"] == str(cases / "b.json")
+    assert catalog.find("missing") is None
+
+    # a fresh catalog reuses saved entries whose mtime and size match instead of re-reading them
+    unchanged = dict(catalog.entries["a.json"], description="from the saved catalog")
+    catalog.entries["a.json"] = unchanged
+    catalog.save()
+    (cases / "b.json").write_text(json.dumps({"id": "S2", "type": "system"}))
+    (cases / "list.json").unlink()
+    catalog = runner.CaseCatalog(str(cases), catalog_file).refresh()
+    assert catalog.entries["a.json"]["description"] == "from the saved catalog"
+    assert catalog.find("S2") and catalog.find("S1") is None
+    assert "list.json" not in catalog.entries
+    assert sorted(json.loads((tmp_path / "catalog.json").read_text())["entries"]) == ["a.json", "b.json", "broken.json"]
+
+#impacted test selection from a hand-written impact map, falling back to the full suite (None) when unsure
+def test_select_impacted_tests(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "app.py").write_text("LIMIT = 1\n\ndef f():\n    return 1\n\ndef g():\n    return 2\n")
+    for cmd in (["init", "-q"], ["add", "app.py"], ["-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "base"]):
+        subprocess.run(["git", *cmd], check=True, capture_output=True)
+    impact_file = str(tmp_path / "impact_map.json")
+    assert runner.select_impacted_tests("HEAD", impact_file) is None  # no map yet
+
+    impact_map = {"commit": "", "sources": {"app.py": runner.file_hash("app.py")}, "module_level": {"app.py": [1, 3, 6]},
+                  "tests": {"tests/test_app.py::test_f": {"app.py": [4]}, "tests/test_app.py::test_g": {"app.py": [7]},
+                            "tests/test_other.py::test_o": {}}}
+    (tmp_path / "impact_map.json").write_text(json.dumps(impact_map))
+    all_tests = ["tests/test_app.py::test_f", "tests/test_app.py::test_g", "tests/test_app.py::test_new", "tests/test_other.py::test_o"]
+    monkeypatch.setattr(runner, "collect_tests", lambda test_type=None: all_tests)
+
+    def select(changes):
+        monkeypatch.setattr(runner, "changed_lines", lambda ref: changes)
+        return runner.select_impacted_tests("HEAD", impact_file)
+
+    # test_new isn't in the map, so it always runs
+    assert select({"app.py": ({4}, {4})}) == ["tests/test_app.py::test_f", "tests/test_app.py::test_new"]
+    assert select({"app.py": (set(), {7, 8})}) == ["tests/test_app.py::test_g", "tests/test_app.py::test_new"]
+    assert select({"tests/test_other.py": ({2}, {2}), "README.md": ({1}, {1})}) == [
+        "tests/test_app.py::test_new", "tests/test_other.py::test_o"]
+    assert select({"app.py": ({1}, {1})}) is None
+    assert select({"app.py": ({4}, {4}), "new_module.py": None}) is None
+    assert select(None) is None
+    out = capsys.readouterr().out
+    assert "Module level code in app.py changed" in out and "new_module.py changed and isn't in the impact map" in out
+
+    impact_map["sources"]["app.py"] = "0" * 64  # recorded on another version of app.py
+    (tmp_path / "impact_map.json").write_text(json.dumps(impact_map))
+    assert select({"app.py": ({4}, {4})}) is None
+    assert "Impact map is stale for app.py" in capsys.readouterr().out
@@ -1,7 +1,8 @@
 #simulating multiple reports and full end-to-end workflow 
 
+import threading
 import pytest
-from disaster_app import parse_emergency_report, assign_responder, update_responder, send_alert
+from disaster_app import parse_emergency_report, assign_responder, update_responder, send_alert, ResponderPool, RegionalDispatcher
 
 def test_system_workflow():
     #makeup reports and responders
@@ -46,3 +47,69 @@ def test_system_workflow():
     
     #make sure after all emergencies are dealt with responders are available again
     assert all(status == "available" for status in responders.values())
+
+
+#many threads dispatching from one shared pool should never hand out the same responder twice
+def test_system_concurrent_pool_dispatch():
+    pool = ResponderPool({f"R{i}": "available" for i in range(200)})
+    assigned = []
+    errors = []
+
+    def worker():
+        for _ in range(25):
+            try:
+                responder, _ = assign_responder({"location": "NYC", "severity": 1}, pool)
+                assigned.append(responder)
+            except RuntimeError:
+                errors.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(assigned) == 200 and len(set(assigned)) == 200 #every responder used exactly once
+    assert len(errors) == 50 #the rest found nobody free
+    assert pool.available_count() == 0
+
+
+#reports are dispatched by the process owning their region, spilling over once a region runs dry
+def test_system_regional_dispatch():
+    responders = {
+        "East": {"Joe":"available", "Lamar":"available", "Kaden":"available"},
+        "West": {"Josh":"available", "Nate":"busy"},
+    }
+    reports = [
+        {"location": "NYC", "region": "East", "severity": 1},
+        {"location": "LA", "region": "West", "severity": 2},
+        {"location": "Boston", "region": "East", "severity": 3},
+        {"location": "Seattle", "region": "West", "severity": 5},
+        {"location": "Denver", "severity": 4},
+        {"location": "Miami", "region": "East"},
+    ]
+    with RegionalDispatcher(responders, processes=2) as dispatcher:
+        results = dispatcher.dispatch(reports)
+
+        assert [r["status"] for r in results] == ["assigned", "queued", "assigned", "assigned", "assigned", "rejected"]
+        assert results[3]["responder"] == "Josh" #most severe West report got the only West responder
+        assert results[4]["region"] == "East" #Denver has no region and fell back to spare East capacity
+        assert "ALERT:" in results[2]["alert"]
+
+        dispatcher.update("West", "Nate", "available")
+        assert dispatcher.dispatch([reports[0]])[0]["responder"] == "Nate"
+        with pytest.raises(ValueError):
+            dispatcher.update("West", "Patrick", "busy")
+
+        assert all(status == "busy" for region in dispatcher.snapshot().values() for status in region.values())
+        #invalid reports nobody owns are rejected, not queued, even with nobody free
+        assert dispatcher.dispatch([{"severity": 3}])[0]["status"] == "rejected"
+
+    #an invalid report for an unknown region doesn't use up fallback capacity
+    with RegionalDispatcher({"East": {"Joe":"available"}, "West": {"Josh":"busy"}}, processes=2) as dispatcher:
+        results = dispatcher.dispatch([
+            {"location": "Nowhere", "region": "Nowhere", "severity": 9, "coordinates": "bad"},
+            {"location": "Nowhere", "region": "Nowhere", "severity": 1},
+        ])
+        assert [r["status"] for r in results] == ["rejected", "assigned"]
+        assert results[1]["responder"] == "Joe"
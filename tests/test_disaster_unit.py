@@ -1,7 +1,13 @@
 #unit testing script for the disaster response app
 
+import asyncio
+import io
+import math
+import random
+import threading
 import pytest
-from disaster_app import parse_emergency_report, assign_responder, update_responder, send_alert
+from disaster_app import parse_emergency_report, assign_responder, update_responder, send_alert, ResponderPool, assign_responder_async, stream_reports, SpatialGrid, CompactResponders
+import disaster_app
 
 #check that the report is parsed correctly
 def test_parse_report_pass():
@@ -46,4 +52,203 @@ def test_update_responder_fail():
 def test_send_alert():
     msg = send_alert("Fire reported", "NYC")
     assert "Fire reported" in msg
-    assert "NYC" in msg
\ No newline at end of file
+    assert "NYC" in msg
+
+#check that a responder pool assigns from its available index and keeps it in sync
+def test_assign_responder_pool_pass():
+    report = {"location": "LA", "severity": 2}
+    pool = ResponderPool({"Joe":"available", "Lamar":"busy", "Josh":"available"})
+    responder, updated = assign_responder(report, pool)
+    assert updated is pool
+    assert responder in ("Joe", "Josh")
+    assert pool[responder] == "busy"
+    assert pool.available_count() == 1
+
+#check that assigning from a pool fails once everybody is busy
+def test_assign_responder_pool_fail():
+    report = {"location": "LA", "severity": 2}
+    pool = ResponderPool({"Joe":"available"})
+    assign_responder(report, pool)
+    with pytest.raises(RuntimeError):
+        assign_responder(report, pool)
+
+#check that updating a pooled responder puts them back in the available index
+def test_update_responder_pool():
+    pool = ResponderPool({"Joe":"busy", "Lamar":"busy"})
+    update_responder("Lamar", "available", pool)
+    assert pool.available_count() == 1
+    responder, _ = assign_responder({"location": "NYC", "severity": 1}, pool)
+    assert responder == "Lamar"
+    with pytest.raises(ValueError):
+        update_responder("Patrick", "busy", pool)
+
+
+#check that a timed out wait still fails with the usual error
+def test_assign_responder_timeout_fail():
+    report = {"location": "LA", "severity": 2}
+    for responders in ({"Joe":"busy"}, ResponderPool({"Joe":"busy"})):
+        with pytest.raises(RuntimeError):
+            assign_responder(report, responders, timeout=0.05)
+
+#check that a waiting assignment gets the responder freed up by update_responder
+def test_assign_responder_waits_for_update():
+    report = {"location": "LA", "severity": 2}
+    for responders in ({"Joe":"busy"}, ResponderPool({"Joe":"busy"})):
+        timer = threading.Timer(0.05, update_responder, ("Joe", "available", responders))
+        timer.start()
+        responder, _ = assign_responder(report, responders, timeout=5)
+        timer.join()
+        assert responder == "Joe"
+        assert responders["Joe"] == "busy"
+
+#check that severity ordered pools hand the next responder to the most severe waiter
+def test_assign_responder_severity_order():
+    pool = ResponderPool({"Joe":"busy"}, wait_order="severity")
+    served = []
+
+    def wait(severity):
+        responder, _ = assign_responder({"location": "LA", "severity": severity}, pool, timeout=5)
+        served.append(severity)
+        update_responder(responder, "available", pool)
+
+    threads = [threading.Thread(target=wait, args=(severity,)) for severity in (1, 5)]
+    for t in threads:
+        t.start()
+    while len(pool._waiters) < 2:
+        threading.Event().wait(0.01)
+    update_responder("Joe", "available", pool)
+    for t in threads:
+        t.join()
+    assert served == [5, 1]
+
+#check that writing the pool like a dict also hands the freed responder to a waiter
+def test_pool_setitem_serves_waiters():
+    pool = ResponderPool({"Joe":"busy"})
+    timer = threading.Timer(0.05, pool.__setitem__, ("Joe", "available"))
+    timer.start()
+    assert pool.acquire(timeout=5) == "Joe"
+    timer.join()
+    assert pool["Joe"] == "busy" and pool.available_count() == 0
+
+#check that waiters on a plain dict are served first come first served
+def test_assign_responder_dict_fifo():
+    responders = {"Joe":"busy"}
+    served = []
+
+    def wait(order):
+        responder, _ = assign_responder({"location": "LA", "severity": 2}, responders, timeout=5)
+        served.append(order)
+        update_responder(responder, "available", responders)
+
+    threads = []
+    for order in range(3):
+        threads.append(threading.Thread(target=wait, args=(order,)))
+        threads[-1].start()
+        while len(disaster_app._dict_waiters.get(id(responders), ())) <= order:
+            threading.Event().wait(0.01)
+    update_responder("Joe", "available", responders)
+    for t in threads:
+        t.join()
+    assert served == [0, 1, 2]
+    assert id(responders) not in disaster_app._dict_waiters
+
+#check the asyncio variant waits on the event loop for a responder
+def test_assign_responder_async():
+    async def scenario():
+        pool = ResponderPool({"Joe":"busy"})
+        asyncio.get_running_loop().call_later(0.05, update_responder, "Joe", "available", pool)
+        responder, _ = await assign_responder_async({"location": "LA", "severity": 2}, pool, timeout=5)
+        with pytest.raises(RuntimeError):
+            await assign_responder_async({"location": "LA", "severity": 2}, pool, timeout=0.05)
+        return responder
+
+    assert asyncio.run(scenario()) == "Joe"
+
+
+#check that a report feed is parsed lazily and bad lines are rejected instead of stopping it
+def test_stream_reports():
+    feed = io.StringIO(
+        '{"location": "NYC", "severity": "3"}\n'
+        '\n'
+        '{"location": "LA"}\n'
+        'not json\n'
+        '{"location": "Chicago", "severity": 1}\n'
+    )
+    rejects = []
+    parsed = list(stream_reports(feed, rejects=rejects.append, chunk_size=16))
+    assert parsed == [{"location": "NYC", "severity": 3}, {"location": "Chicago", "severity": 1}]
+    assert [r["line"] for r in rejects] == [3, 4]
+    assert rejects[0]["error"] == "Invalid report format"
+
+
+#check the grid always finds the same closest point as a brute force scan
+def test_spatial_grid_nearest():
+    rng = random.Random(7)
+    points = {f"R{i}": (rng.uniform(-50, 50), rng.uniform(-50, 50)) for i in range(300)}
+    grid = SpatialGrid(cell_size=5)
+    for name, point in points.items():
+        grid.add(name, point)
+    for name in list(points)[:100]:
+        grid.remove(name)
+        del points[name]
+
+    for _ in range(50):
+        query = (rng.uniform(-80, 80), rng.uniform(-80, 80))
+        expected = min(points, key=lambda name: math.dist(points[name], query))
+        assert grid.nearest(query) == expected
+    assert SpatialGrid().nearest((0, 0)) is None
+
+
+#check the compact fleet reads and updates like the plain dict it replaces
+def test_compact_responders():
+    plain = {"Joe":"available", "Lamar":"busy", "José":"available"}
+    compact = CompactResponders(plain)
+    assert compact == plain and dict(compact) == plain
+    assert "Lamar" in compact and "Patrick" not in compact
+
+    responder, updated = assign_responder({"location": "LA", "severity": 2}, compact)
+    assert updated is compact and compact[responder] == "busy"
+    update_responder(responder, "on scene", compact)
+    assert compact[responder] == "on scene"
+    with pytest.raises(ValueError):
+        update_responder("Patrick", "busy", compact)
+
+    compact["Patrick"] = "available"
+    del compact["Lamar"]
+    assert sorted(compact) == sorted(["Joe", "José", "Patrick"])
+
+
+#check that instrumentation counts calls, failures and lock timings only while it's on
+def test_instrumentation_snapshot(tmp_path):
+    report = {"location": "LA", "severity": 2}
+    previous = disaster_app.set_instrumentation(disaster_app.Instrumentation())
+    try:
+        pool = ResponderPool({"Joe":"available"})
+        assign_responder(report, pool)
+        with pytest.raises(RuntimeError):
+            assign_responder(report, pool)
+        update_responder("Joe", "available", {"Joe":"busy"})
+        snapshot = disaster_app.instrumentation_snapshot()
+        disaster_app.dump_instrumentation(tmp_path / "instrumentation.json")
+    finally:
+        disaster_app.set_instrumentation(previous)
+
+    assign = snapshot["assign_responder"]
+    assert assign["calls"] == 2
+    assert assign["failures"] == {"RuntimeError": 1}
+    assert assign["lock_wait_ns"]["count"] == 2 and assign["lock_hold_ns"]["count"] == 2
+    assert assign["pool_size"]["max"] == 1
+    assert snapshot["update_responder"]["calls"] == 1
+    assert "operations" in (tmp_path / "instrumentation.json").read_text()
+
+#waiting on a dict's condition releases the lock, so it counts as waiting, not holding
+def test_instrumentation_excludes_condition_waits():
+    previous = disaster_app.set_instrumentation(disaster_app.Instrumentation())
+    try:
+        with pytest.raises(RuntimeError):
+            assign_responder({"location": "LA", "severity": 2}, {"Joe":"busy"}, timeout=0.2)
+        assign = disaster_app.instrumentation_snapshot()["assign_responder"]
+    finally:
+        disaster_app.set_instrumentation(previous)
+    assert assign["latency_ns"]["max"] >= 200_000_000
+    assert assign["lock_hold_ns"]["max"] < 100_000_000
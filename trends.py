@@ -0,0 +1,201 @@
+"""Rolling trend aggregates over the run history and regression checks against them.
+
+Each tracked metric keeps running aggregates that are updated once per run: moving
+averages, min/max and percentiles over the last 10 and 50 runs (from a ring of the
+last 50 values), plus count, mean, standard deviation (Welford), min/max and P²
+streaming percentile estimates over all runs. Updating never rescans the history;
+the whole state is a few hundred numbers and is kept in the history index.
+
+A new run is flagged as a regression when a metric moves in the bad direction by
+more than `threshold` standard deviations from its last-50-runs baseline.
+"""
+import math
+
+WINDOWS = (10, 50)
+PERCENTILES = (0.5, 0.9)
+# metric -> (direction that is bad, smallest spread that counts as noise)
+METRICS = {
+    "coverage": ("down", 0.5),          # percentage points
+    "failure_rate": ("up", 0.5),        # percent of tests failing or erroring
+    "duration": ("up", 0.05),           # seconds, also at least 5% of the mean
+}
+MIN_BASELINE_RUNS = 5
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class P2Quantile:
+    """Streaming quantile estimate (Jain & Chlamtac's P² algorithm) in constant space."""
+
+    def __init__(self, p, state=None):
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+        if state:
+            self.heights, self.positions, self.desired = state["heights"], state["positions"], state["desired"]
+
+    def state(self):
+        return {"heights": self.heights, "positions": self.positions, "desired": self.desired}
+
+    def add(self, x):
+        q, n = self.heights, self.positions
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = max(i for i in range(4) if q[i] <= x)
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < height < q[i + 1]:
+                    # parabolic step overshot its neighbours, fall back to linear
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def value(self):
+        if len(self.heights) < 5:
+            return percentile(self.heights, self.p)
+        return self.heights[2]
+
+
+class MetricTrend:
+    """Running aggregates for one metric."""
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.count = state.get("count", 0)
+        self.mean = state.get("mean", 0.0)
+        self.m2 = state.get("m2", 0.0)
+        self.min = state.get("min")
+        self.max = state.get("max")
+        # last max(WINDOWS) values, oldest first
+        self.recent = state.get("recent", [])
+        self.quantiles = {p: P2Quantile(p, state.get("quantiles", {}).get(str(p))) for p in PERCENTILES}
+
+    def state(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max,
+                "recent": self.recent, "quantiles": {str(p): q.state() for p, q in self.quantiles.items()}}
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.recent.append(value)
+        del self.recent[:-max(WINDOWS)]
+        for quantile in self.quantiles.values():
+            quantile.add(value)
+
+    def window(self, size):
+        """Mean, std, min, max and percentiles over the last `size` values."""
+        values = self.recent[-size:]
+        if not values:
+            return {"runs": 0}
+        mean = sum(values) / len(values)
+        std = math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1)) if len(values) > 1 else 0.0
+        ordered = sorted(values)
+        summary = {"runs": len(values), "mean": round(mean, 3), "std": round(std, 3),
+                   "min": ordered[0], "max": ordered[-1]}
+        for p in PERCENTILES:
+            summary[f"p{int(p * 100)}"] = percentile(ordered, p)
+        return summary
+
+    def overall(self):
+        if not self.count:
+            return {"runs": 0}
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        summary = {"runs": self.count, "mean": round(self.mean, 3), "std": round(std, 3),
+                   "min": self.min, "max": self.max}
+        for p, quantile in self.quantiles.items():
+            value = quantile.value()
+            summary[f"p{int(p * 100)}"] = round(value, 3) if value is not None else None
+        return summary
+
+    def summary(self):
+        result = {f"last_{size}": self.window(size) for size in WINDOWS}
+        result["all"] = self.overall()
+        return result
+
+
+class TrendEngine:
+    """Trends for every metric in METRICS; state() round-trips through JSON."""
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.metrics = {name: MetricTrend(state.get(name)) for name in METRICS}
+
+    def state(self):
+        return {name: trend.state() for name, trend in self.metrics.items()}
+
+    def update(self, values):
+        """Add one run's metric values (missing/None values are skipped)."""
+        for name, value in values.items():
+            if name in self.metrics and value is not None:
+                self.metrics[name].add(value)
+
+    def summary(self):
+        return {name: trend.summary() for name, trend in self.metrics.items()}
+
+    def regressions(self, values, threshold=3.0, window=max(WINDOWS)):
+        """Metrics in `values` that are worse than the baseline by more than `threshold` standard deviations.
+
+        Call before update() so the run isn't part of its own baseline.
+        """
+        found = []
+        for name, value in values.items():
+            if value is None or name not in self.metrics:
+                continue
+            baseline = self.metrics[name].window(window)
+            if baseline["runs"] < MIN_BASELINE_RUNS:
+                continue
+            direction, floor = METRICS[name]
+            spread = max(baseline["std"], floor, abs(baseline["mean"]) * 0.05 if name == "duration" else 0)
+            score = (value - baseline["mean"]) / spread
+            if direction == "down":
+                score = -score
+            if score > threshold:
+                found.append({"metric": name, "value": round(value, 3), "baseline_mean": baseline["mean"],
+                              "baseline_std": baseline["std"], "baseline_runs": baseline["runs"],
+                              "score": round(score, 2)})
+        return found
+
+
+def run_metrics(run):
+    """The tracked metric values of a (final or stored) report."""
+    summary = run.get("summary", {})
+    total = summary.get("total") or 0
+    failing = (summary.get("failed") or 0) + (summary.get("errors") or 0)
+    coverage = run.get("coverage", {}).get("overall_coverage")
+    return {
+        "coverage": float(coverage.strip("%")) if coverage else None,
+        "failure_rate": 100.0 * failing / total if total else None,
+        "duration": run.get("duration"),
+    }